@@ -0,0 +1,196 @@
+import argparse
+import os
+import random
+import time
+from itertools import combinations
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+from fighting_game import (
+    WIDTH, FPS, FLOOR_Y, PLAYER_WIDTH, PLAYER_HEIGHT, SHOOT_DAMAGE,
+    BLUE, RED, Fighter, ProjectilePool, VillainBrain, apply_action,
+)
+
+# --- ARENA (N brain-driven fighters, free-for-all) ---
+# Generalizes Match to any number of fighters. Body pushing, attack hitboxes and
+# projectile hits use a sort-and-sweep broad phase along x, so only fighters whose
+# x-ranges overlap are ever tested against each other.
+
+def sweep_self(rects):
+    """Pairs (i, j) of rects whose x-ranges overlap (sort-and-sweep)."""
+    order = sorted(range(len(rects)), key=lambda i: rects[i].left)
+    active = []
+    for i in order:
+        left = rects[i].left
+        active = [j for j in active if rects[j].right > left]
+        for j in active:
+            yield j, i
+        active.append(i)
+
+def sweep_cross(a_rects, b_rects):
+    """Pairs (i, j) with a_rects[i] and b_rects[j] overlapping on x (sort-and-sweep)."""
+    groups = (a_rects, b_rects)
+    events = sorted([(r.left, 0, i) for i, r in enumerate(a_rects)]
+                    + [(r.left, 1, j) for j, r in enumerate(b_rects)])
+    active = ([], [])
+    for left, side, k in events:
+        other = 1 - side
+        # Entries are pruned lazily, when the opposite group is swept past them
+        live = [m for m in active[other] if groups[other][m].right > left]
+        active[other][:] = live
+        for m in live:
+            yield (k, m) if side == 0 else (m, k)
+        active[side].append(k)
+
+def _all_pairs(a_rects, b_rects):
+    # Brute-force reference for --broad-phase all
+    for i in range(len(a_rects)):
+        for j in range(len(b_rects)):
+            yield i, j
+
+
+class Arena:
+    def __init__(self, n, headless=True, projectile_capacity=1024, broad_phase="sweep"):
+        self.frame = 0
+        self.sweep = broad_phase == "sweep"
+        self.projectiles = ProjectilePool(projectile_capacity)
+        spacing = (WIDTH - PLAYER_WIDTH) / max(n - 1, 1)
+        self.fighters = []
+        for i in range(n):
+            f = Fighter(int(i * spacing), FLOOR_Y - PLAYER_HEIGHT, BLUE if i % 2 == 0 else RED,
+                        is_ai=i % 2 == 1, headless=headless, clock=self.ticks_ms)
+            f.projectile_pool = self.projectiles
+            f.pool_owner = i
+            self.fighters.append(f)
+        self.alive = list(range(n))
+        self.damage_dealt = [0] * n
+        self.game_over = False
+        self.winner = None  # index of the last fighter standing
+
+    def ticks_ms(self):
+        return self.frame * 1000 // FPS
+
+    def nearest_enemies(self):
+        """{fighter: closest living fighter}, from neighbours in x-sorted order."""
+        order = sorted(self.alive, key=lambda i: self.fighters[i].rect.centerx)
+        targets = {}
+        for k, i in enumerate(order):
+            cx = self.fighters[i].rect.centerx
+            best = None
+            for n in (k - 1, k + 1):
+                if 0 <= n < len(order):
+                    j = order[n]
+                    if best is None or abs(self.fighters[j].rect.centerx - cx) < abs(self.fighters[best].rect.centerx - cx):
+                        best = j
+            targets[i] = best
+        return targets
+
+    def decide(self, brains):
+        """Each living fighter's brain picks an action against its nearest enemy."""
+        targets = self.nearest_enemies()
+        actions = [None] * len(self.fighters)
+        for i, t in targets.items():
+            if t is not None:
+                actions[i] = brains[i].decide_action(self.fighters[i], self.fighters[t])
+        return actions, targets
+
+    def _push_bodies(self, actions):
+        alive = self.alive
+        rects = [self.fighters[i].rect for i in alive]
+        pairs = sweep_self(rects) if self.sweep else combinations(range(len(rects)), 2)
+        for p, q in pairs:
+            a, b = rects[p], rects[q]
+            if not a.colliderect(b):
+                continue
+            # Cross-up: ignore if one is significantly above the other
+            if a.bottom < b.centery + 20 or b.bottom < a.centery + 20:
+                continue
+            if a.centerx > b.centerx:
+                p, q, a, b = q, p, b, a
+            # a is on the LEFT, b on the RIGHT
+            if actions[alive[p]] == "RIGHT":
+                a.right = b.left # Hard Stop
+            elif actions[alive[q]] == "LEFT":
+                b.left = a.right # Hard Stop
+            else:
+                mid = (a.centerx + b.centerx) / 2
+                a.right = mid
+                b.left = mid
+
+    def _hit(self, attacker, defender, amount):
+        if self.fighters[defender].take_damage(amount):
+            self.damage_dealt[attacker] += amount
+
+    def step(self, actions, targets):
+        """Advance one frame. actions[i] is fighter i's action, targets[i] who it faces."""
+        if self.game_over:
+            return True
+        fighters = self.fighters
+
+        # --- INPUT ---
+        for i in self.alive:
+            if actions[i] is not None:
+                apply_action(fighters[i], fighters[targets[i]], actions[i])
+
+        # --- PHYSICS ---
+        attacks = []
+        for i in self.alive:
+            hitbox = fighters[i].update()
+            if hitbox and not fighters[i].has_hit:
+                attacks.append((i, hitbox))
+        self.projectiles.update()
+        self._push_bodies(actions)
+
+        # --- COMBAT ---
+        bodies = [fighters[i].rect for i in self.alive]
+        hitboxes = [hb for _, hb in attacks]
+        pairs = sweep_cross(hitboxes, bodies) if self.sweep else _all_pairs(hitboxes, bodies)
+        landed = set()
+        for h, b in pairs:
+            attacker, defender = attacks[h][0], self.alive[b]
+            if attacker != defender and hitboxes[h].colliderect(bodies[b]):
+                self._hit(attacker, defender, 8 if fighters[attacker].attack_type == "punch" else 5)
+                landed.add(attacker)
+        for i in landed:
+            fighters[i].has_hit = True
+
+        # Projectiles
+        for i, shooters in zip(self.alive, self.projectiles.collide_sorted(bodies, self.alive)):
+            for shooter in shooters:
+                self._hit(shooter, i, SHOOT_DAMAGE)
+
+        # Knockouts
+        self.alive = [i for i in self.alive if fighters[i].health > 0]
+        if len(self.alive) <= 1:
+            self.game_over = True
+            self.winner = self.alive[0] if self.alive else None
+
+        self.frame += 1
+        return self.game_over
+
+def run_arena(brains, max_frames=FPS * 99, broad_phase="sweep"):
+    arena = Arena(len(brains), broad_phase=broad_phase)
+    while not arena.game_over and arena.frame < max_frames:
+        arena.step(*arena.decide(brains))
+    return arena
+
+def main():
+    parser = argparse.ArgumentParser(description="Stress-test brains in an N-fighter free-for-all.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[2, 4, 8, 16, 32, 64])
+    parser.add_argument("--frames", type=int, default=1000)
+    parser.add_argument("--broad-phase", choices=["sweep", "all"], default="sweep")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'FIGHTERS':>8}{'FRAMES':>8}{'MS/FRAME':>10}{'US/FIGHTER':>12}  RESULT")
+    for n in args.sizes:
+        random.seed(args.seed)
+        brains = [VillainBrain(("Easy", "Medium", "Hard")[i % 3]) for i in range(n)]
+        start = time.perf_counter()
+        arena = run_arena(brains, args.frames, args.broad_phase)
+        elapsed = time.perf_counter() - start
+        ms = 1000.0 * elapsed / max(arena.frame, 1)
+        result = f"fighter {arena.winner} wins" if arena.game_over else f"{len(arena.alive)} standing"
+        print(f"{n:>8}{arena.frame:>8}{ms:>10.3f}{1000.0 * ms / n:>12.1f}  {result}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,380 @@
+import numpy as np
+
+from fighting_game import (
+    WIDTH, FPS, GRAVITY, FLOOR_Y, PLAYER_WIDTH, PLAYER_HEIGHT, SPEED,
+    JUMP_FORCE, SHOOT_DAMAGE, Match, LearningVillainBrain, VillainBrain, CompiledVillainBrain,
+    GAP_EDGES, POLICY_AWAY, POLICY_TOWARDS, policy_arrays,
+)
+
+# --- BATCH ENVIRONMENT (N matches stepped in lockstep) ---
+# Mirrors Match.step() with both sides driven by brain-style actions, but keeps
+# every fighter field as a NumPy array so one step advances all N matches.
+# Per-fighter arrays have shape (2, N): row 0 is P1, row 1 is P2.
+
+ACTIONS = LearningVillainBrain.ACTIONS
+LEFT, RIGHT, JUMP, PUNCH, KICK, SHIELD, SHOOT, IDLE = range(len(ACTIONS))
+
+ATTACK_NONE, ATTACK_PUNCH, ATTACK_KICK = 0, 1, 2
+
+GROUND_Y = FLOOR_Y - PLAYER_HEIGHT
+HALF_W = PLAYER_WIDTH // 2
+HALF_H = PLAYER_HEIGHT // 2
+PROJ_SIZE = 30
+PROJ_SPEED = 15
+
+def _round(v):
+    # pygame.Rect rounds float coordinates half away from zero
+    return np.copysign(np.floor(np.abs(v) + 0.5), v).astype(np.int64)
+
+def _overlap(a_pos, a_len, b_pos, b_len):
+    # One axis of pygame.Rect.colliderect (touching edges do not collide)
+    return (a_pos < b_pos + b_len) & (b_pos < a_pos + a_len)
+
+
+class BatchMatch:
+    def __init__(self, n, max_frames=FPS * 99):
+        self.n = n
+        self.max_frames = max_frames
+        shape = (2, n)
+
+        # Body
+        self.x = np.zeros(shape, np.int64)
+        self.y = np.zeros(shape, np.int64)
+        self.vel_y = np.zeros(shape, np.float64)
+        self.direction = np.zeros(shape, np.int64)
+        self.health = np.zeros(shape, np.int64)
+
+        # Attack state
+        self.is_attacking = np.zeros(shape, bool)
+        self.attack_type = np.zeros(shape, np.int8)
+        self.attack_frame = np.zeros(shape, np.int64)
+        self.has_hit = np.zeros(shape, bool)
+        self.combo_count = np.zeros(shape, np.int64)
+        self.last_attack_time = np.zeros(shape, np.int64)
+
+        # Shield
+        self.is_shielding = np.zeros(shape, bool)
+        self.shield_gauge = np.zeros(shape, np.float64)
+        self.shield_cooldown = np.zeros(shape, np.int64)
+
+        # Projectile (one per fighter, like Fighter.projectile)
+        self.has_shot = np.zeros(shape, bool)
+        self.shoot_anim_frame = np.zeros(shape, np.int64)
+        self.proj_active = np.zeros(shape, bool)
+        self.proj_x = np.zeros(shape, np.int64)
+        self.proj_y = np.zeros(shape, np.int64)
+        self.proj_dir = np.zeros(shape, np.int64)
+
+        # Per match
+        self.frame = np.zeros(n, np.int64)
+        self.done = np.zeros(n, bool)
+        self.winner = np.zeros(n, np.int8)  # 0 = none/draw, 1 = P1, 2 = P2
+
+        self.reset()
+
+    def reset(self, mask=None):
+        """Reset every match, or only those where the boolean mask is set."""
+        m = slice(None) if mask is None else mask
+        self.x[0, m] = Match.P1_START_X
+        self.x[1, m] = Match.P2_START_X
+        self.y[:, m] = GROUND_Y
+        self.vel_y[:, m] = 0
+        self.direction[0, m] = 1
+        self.direction[1, m] = -1
+        self.health[:, m] = 100
+
+        self.is_attacking[:, m] = False
+        self.attack_type[:, m] = ATTACK_NONE
+        self.attack_frame[:, m] = 0
+        self.has_hit[:, m] = False
+        self.combo_count[:, m] = 0
+        self.last_attack_time[:, m] = 0
+
+        self.is_shielding[:, m] = False
+        self.shield_gauge[:, m] = 100
+        self.shield_cooldown[:, m] = 0
+
+        self.has_shot[:, m] = False
+        self.shoot_anim_frame[:, m] = 0
+        self.proj_active[:, m] = False
+
+        self.frame[m] = 0
+        self.done[m] = False
+        self.winner[m] = 0
+
+    def encode_states(self, s):
+        """LearningVillainBrain._encode_state() for side s in every match."""
+        e = 1 - s
+        dist = np.abs(self.x[s] - self.x[e])  # equal widths: same as centerx distance
+        cornered = (self.x[s] < 120) | (self.x[s] + PLAYER_WIDTH > WIDTH - 120)
+        return LearningVillainBrain.state_index(
+            dist // 50,
+            self.is_attacking[e].astype(np.int64),
+            self.proj_active[e].astype(np.int64),
+            (self.shield_gauge[s] > 20).astype(np.int64),
+            cornered.astype(np.int64),
+        )
+
+    # --- Fighter method equivalents (s = side index, rows = matches affected) ---
+    # Masked writes go through np.copyto(..., where=) or multiply-by-mask
+    # arithmetic rather than boolean fancy indexing, which gathers/scatters.
+    def _move(self, s, rows, dx):
+        # Only the moving rows are clamped: a collision push can leave a fighter
+        # off screen, and Fighter.move never touches the one standing still
+        x = self.x[s]
+        np.copyto(x, np.clip(x + dx, 0, WIDTH - PLAYER_WIDTH), where=rows)
+        np.copyto(self.direction[s], 1 if dx > 0 else -1, where=rows)
+
+    def _jump(self, s, rows):
+        on_floor = self.y[s] + PLAYER_HEIGHT == FLOOR_Y
+        np.copyto(self.vel_y[s], JUMP_FORCE, where=rows & on_floor)
+
+    def _attack(self, s, rows, attack_type):
+        ok = rows & ~self.is_attacking[s] & ~self.is_shielding[s]
+        self.is_attacking[s] |= ok
+        self.has_hit[s] &= ~ok
+        np.copyto(self.attack_type[s], attack_type, where=ok)
+        np.copyto(self.attack_frame[s], 20, where=ok)
+
+        # Combo: same 800ms window as Fighter.attack, on the sim clock
+        now = self.frame * 1000 // FPS
+        combo = self.combo_count[s]
+        chain = now - self.last_attack_time[s] < 800
+        np.copyto(combo, np.where(chain, np.minimum(combo + 1, 3), 1), where=ok)
+        np.copyto(self.last_attack_time[s], now, where=ok)
+
+    def _shoot(self, s, rows):
+        ok = rows & ~self.has_shot[s] & ~self.is_attacking[s] & ~self.is_shielding[s]
+        self.has_shot[s] |= ok
+        np.copyto(self.shoot_anim_frame[s], 20, where=ok)
+        facing_right = self.direction[s] == 1
+        start_x = np.where(facing_right, self.x[s] + PLAYER_WIDTH, self.x[s])
+        self.proj_active[s] |= ok
+        np.copyto(self.proj_x[s], start_x, where=ok)
+        np.copyto(self.proj_y[s], self.y[s] + HALF_H - 75, where=ok)
+        np.copyto(self.proj_dir[s], self.direction[s], where=ok)
+
+    def _toggle_shield(self, s, rows, active):
+        gauge = self.shield_gauge[s]
+        cooling = rows & (self.shield_cooldown[s] > 0)
+        free = rows & ~cooling
+        on = free & active & (gauge > 0)
+        off = free & ~on
+
+        gauge -= 1.5 * on
+        broke = on & (gauge <= 0)
+        np.copyto(self.is_shielding[s], on & ~broke, where=rows)
+        np.copyto(self.shield_cooldown[s], 180, where=broke)
+        gauge += 0.5 * (off & (gauge < 100))
+
+    def _apply_actions(self, s, actions):
+        everyone = np.ones(self.n, bool)
+        self._toggle_shield(s, everyone, np.zeros(self.n, bool)) # Reset
+
+        self._move(s, actions == LEFT, -SPEED)
+        self._move(s, actions == RIGHT, SPEED)
+        self._jump(s, actions == JUMP)
+        self._attack(s, actions == PUNCH, ATTACK_PUNCH)
+        self._attack(s, actions == KICK, ATTACK_KICK)
+        shield = actions == SHIELD
+        self._toggle_shield(s, shield, shield)
+        self._shoot(s, actions == SHOOT)
+
+        # Always face enemy (equal widths: comparing x is comparing centerx)
+        e = 1 - s
+        self.direction[s] = np.where(self.x[e] < self.x[s], -1, 1)
+
+    def _update(self, s):
+        """Fighter.update(): returns (live, hb_x, hb_y, reach) attack hitboxes."""
+        # Gravity
+        vel_y = self.vel_y[s]
+        vel_y += GRAVITY
+        self.y[s] = _round(self.y[s] + vel_y)
+        landed = self.y[s] + PLAYER_HEIGHT >= FLOOR_Y
+        np.copyto(self.y[s], GROUND_Y, where=landed)
+        np.copyto(vel_y, 0, where=landed)
+
+        # Timers
+        self.shoot_anim_frame[s] -= self.shoot_anim_frame[s] > 0
+        self.shield_cooldown[s] -= self.shield_cooldown[s] > 0
+
+        # Attack hitbox
+        attacking = self.is_attacking[s]
+        frame = self.attack_frame[s]
+        frame -= attacking
+        live = attacking & (10 < frame) & (frame < 18)
+        reach = np.where(self.attack_type[s] == ATTACK_PUNCH, 70, 170)
+        reach += 20 * (self.combo_count[s] == 3)
+        hb_x = np.where(self.direction[s] == 1, self.x[s] + PLAYER_WIDTH, self.x[s] - reach)
+        hb_y = self.y[s] + 20
+        ended = attacking & (frame <= 0)
+        attacking &= ~ended
+        np.copyto(self.attack_type[s], ATTACK_NONE, where=ended)
+
+        # Projectile
+        flying = self.proj_active[s]
+        px = self.proj_x[s]
+        px += PROJ_SPEED * self.proj_dir[s] * flying
+        flying &= (px + PROJ_SIZE >= 0) & (px <= WIDTH)
+
+        return live, hb_x, hb_y, reach
+
+    def _resolve_collision(self, a1, a2):
+        px, vx = self.x[0], self.x[1]
+        py, vy = self.y[0], self.y[1]
+        touching = (_overlap(px, PLAYER_WIDTH, vx, PLAYER_WIDTH)
+                    & _overlap(py, PLAYER_HEIGHT, vy, PLAYER_HEIGHT))
+
+        # Cross-up: ignore if one is significantly above the other
+        player_is_above = py + PLAYER_HEIGHT < vy + HALF_H + 20
+        villain_is_above = vy + PLAYER_HEIGHT < py + HALF_H + 20
+        same_level = touching & ~player_is_above & ~villain_is_above
+        if not same_level.any():
+            return
+
+        pcx, vcx = px + HALF_W, vx + HALF_W
+        mid = _round((pcx + vcx) / 2)
+        p_left = same_level & (pcx < vcx)
+        p_right = same_level & ~(pcx < vcx)
+
+        # CASE A: Player on the LEFT
+        a_p = p_left & (a1 == RIGHT)
+        a_v = p_left & ~a_p & (a2 == LEFT)
+        a_mid = p_left & ~a_p & ~a_v
+        # CASE B: Player on the RIGHT
+        b_p = p_right & (a1 == LEFT)
+        b_v = p_right & ~b_p & (a2 == RIGHT)
+        b_mid = p_right & ~b_p & ~b_v
+
+        np.copyto(px, vx - PLAYER_WIDTH, where=a_p)
+        np.copyto(vx, px + PLAYER_WIDTH, where=a_v)
+        np.copyto(px, mid - PLAYER_WIDTH, where=a_mid)
+        np.copyto(vx, mid, where=a_mid)
+        np.copyto(px, vx + PLAYER_WIDTH, where=b_p)
+        np.copyto(vx, px - PLAYER_WIDTH, where=b_v)
+        np.copyto(px, mid, where=b_mid)
+        np.copyto(vx, mid - PLAYER_WIDTH, where=b_mid)
+
+    def _take_damage(self, d, rows, amount):
+        """Fighter.take_damage(): returns the rows where health was lost."""
+        blocked = rows & self.is_shielding[d]
+        landed = rows & ~self.is_shielding[d]
+        self.shield_gauge[d] -= amount * 2 * blocked
+        self.health[d] -= amount * landed
+        return landed
+
+    def step(self, p1_actions, p2_actions):
+        """
+        Advance every match one frame. Actions are int arrays of indices into ACTIONS.
+        Matches that finished on the previous step are reset first.
+        Returns (dealt, done): damage landed this frame by each side, shape (2, N),
+        and the per-match done flags (see self.winner for who won).
+        """
+        if self.done.any():
+            self.reset(self.done)
+        a1 = np.asarray(p1_actions)
+        a2 = np.asarray(p2_actions)
+
+        # --- INPUT ---
+        self._apply_actions(0, a1)
+        self._apply_actions(1, a2)
+
+        # --- PHYSICS ---
+        hitboxes = [self._update(0), self._update(1)]
+        self._resolve_collision(a1, a2)
+
+        # --- COMBAT ---
+        dealt = np.zeros((2, self.n), np.int64)
+        for s in (0, 1):
+            e = 1 - s
+            live, hb_x, hb_y, reach = hitboxes[s]
+            hit = (live & ~self.has_hit[s]
+                   & _overlap(hb_x, reach, self.x[e], PLAYER_WIDTH)
+                   & _overlap(hb_y, 50, self.y[e], PLAYER_HEIGHT))
+            self.has_hit[s] |= hit
+            dmg = np.where(self.attack_type[s] == ATTACK_PUNCH, 8, 5)
+            landed = self._take_damage(e, hit, dmg)
+            dealt[s] += dmg * landed
+
+        # Projectiles
+        for s in (0, 1):
+            e = 1 - s
+            hit = (self.proj_active[s]
+                   & _overlap(self.proj_x[s], PROJ_SIZE, self.x[e], PLAYER_WIDTH)
+                   & _overlap(self.proj_y[s], PROJ_SIZE, self.y[e], PLAYER_HEIGHT))
+            self.proj_active[s] &= ~hit
+            landed = self._take_damage(e, hit, SHOOT_DAMAGE)
+            dealt[s] += SHOOT_DAMAGE * landed
+
+        # Game Over
+        self.frame += 1
+        p1_dead = self.health[0] <= 0
+        p2_dead = ~p1_dead & (self.health[1] <= 0)
+        np.copyto(self.winner, 2, where=p1_dead)
+        np.copyto(self.winner, 1, where=p2_dead)
+        self.done = p1_dead | p2_dead | (self.frame >= self.max_frames)
+        return dealt, self.done
+
+
+# --- BATCH VILLAIN BRAIN (CompiledVillainBrain for all N matches at once) ---
+# Same busy check, reflexes and held actions as VillainBrain.decide_action, with
+# per-match cooldown/buffer arrays; the decision itself samples policy_arrays()
+# for every match in one pass.
+class BatchVillainBrain:
+    GAP_ROWS = np.array(CompiledVillainBrain.GAP_ROWS)
+
+    def __init__(self, difficulty, n, seed=None):
+        self.difficulty = difficulty
+        self.cum, self.outcome, self.hold = policy_arrays(difficulty)
+        self.cooldown = np.zeros(n, np.int64)
+        self.buffer = np.full(n, IDLE, np.int64)
+        self.rng = np.random.default_rng(seed)
+
+    def reset(self, mask=None):
+        m = slice(None) if mask is None else mask
+        self.cooldown[m] = 0
+        self.buffer[m] = IDLE
+
+    def decide(self, batch, s):
+        """Action indices for side s of every match in batch (a BatchMatch)."""
+        if batch.done.any():
+            # Start the next matches now, so this decision sees their first frame
+            self.reset(batch.done)
+            batch.reset(batch.done)
+        e = 1 - s
+        x = batch.x[s]
+        cx, ex = x + HALF_W, batch.x[e] + HALF_W
+        gap = np.maximum(np.abs(cx - ex) - PLAYER_WIDTH, 0)
+        face_left = ex < cx
+        away = np.where(face_left, RIGHT, LEFT)
+        towards = np.where(face_left, LEFT, RIGHT)
+        attacking = batch.is_attacking[e]
+        can_shield = (batch.shield_gauge[s] > 5) & (batch.shield_cooldown[s] == 0)
+        cornered = np.where(face_left, x + PLAYER_WIDTH > 1300, x < 100)
+        threat = (batch.proj_active[e]
+                  & (np.abs(cx - (batch.proj_x[e] + PROJ_SIZE // 2)) < VillainBrain.proj_threat_range))
+        free = ~(batch.is_attacking[s] | (batch.shoot_anim_frame[s] > 0))
+
+        # Reflexes cut the wait short, then the rest keep holding their action
+        cd = self.cooldown
+        if self.difficulty != "Easy":
+            np.copyto(cd, 0, where=free & attacking & (gap < 100))
+        if self.difficulty == "Hard":
+            np.copyto(cd, 0, where=free & threat)
+        holding = free & (cd > 0)
+        deciding = free & ~holding
+        cd -= holding
+        actions = np.full(batch.n, IDLE, np.int64)
+        held = np.isin(self.buffer, (LEFT, RIGHT, SHIELD))
+        np.copyto(actions, self.buffer, where=holding & held)
+
+        state = (self.GAP_ROWS[np.minimum(gap, GAP_EDGES[-1])] + attacking * 16 + can_shield * 8
+                 + cornered * 4 + batch.has_shot[s] * 2 + threat)
+        u = self.rng.random(batch.n)
+        k = (self.cum[state] <= u[:, None]).sum(axis=1)
+        chosen = self.outcome[state, k].astype(np.int64)
+        chosen = np.where(chosen == POLICY_AWAY, away, np.where(chosen == POLICY_TOWARDS, towards, chosen))
+        np.copyto(actions, chosen, where=deciding)
+        np.copyto(cd, self.hold[state, k], where=deciding)
+        np.copyto(self.buffer, chosen, where=deciding)
+        return actions
@@ -0,0 +1,218 @@
+import argparse
+import copy
+import json
+import os
+import random
+import sys
+import timeit
+
+# Benchmarks render offscreen: no real window needed
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+import numpy as np
+import fighting_game as fg
+from batch_env import BatchMatch, BatchVillainBrain
+
+# --- BENCHMARK SUITE ---
+# Each benchmark returns (op, ops_per_call): op() is timed with timeit and the
+# result is reported as throughput (ops/sec, best of --repeat runs).
+# Results are saved as JSON and compared against a saved baseline.
+
+DEFAULT_BASELINE = "bench_baseline.json"
+BENCHMARKS = {}
+
+def benchmark(name):
+    def register(fn):
+        BENCHMARKS[name] = fn
+        return fn
+    return register
+
+def sample_states(n=500, seed=0):
+    """
+    Match snapshots from a random-action headless match, for brain benchmarks.
+    Only frames where P2 is free to act are kept: a busy villain returns "IDLE"
+    before any rule runs, so those frames would time an early exit.
+    """
+    rng = random.Random(seed)
+    states = []
+    match = fg.Match()
+    while len(states) < n:
+        if match.game_over:
+            match = fg.Match()
+        match.step(rng.choice(fg.LearningVillainBrain.ACTIONS), rng.choice(fg.LearningVillainBrain.ACTIONS))
+        busy = match.p2.is_attacking or match.p2.shoot_anim_frame > 0
+        if match.frame % 5 == 0 and not busy:
+            states.append(copy.deepcopy(match))
+    return states
+
+def _rendered_match():
+    if fg.screen is None:
+        fg.init_display()
+    match = fg.Match(headless=False)
+    for _ in range(10):
+        match.step(fg.INPUT_RIGHT, "LEFT")
+    return match
+
+@benchmark("draw.sprite_animator")
+def bench_sprite_animator():
+    match = _rendered_match()
+    fighters = (match.p1, match.p2)
+    def op():
+        for f in fighters:
+            f.animator.draw(fg.screen, f)
+    return op, 1
+
+@benchmark("draw.fighters")
+def bench_fighter_draw():
+    match = _rendered_match()
+    def op():
+        match.p1.draw(fg.screen)
+        match.p2.draw(fg.screen)
+    return op, 1
+
+@benchmark("draw.frame")
+def bench_frame():
+    match = _rendered_match()
+    bg = fg.load_background()
+    return (lambda: fg.draw_match(fg.screen, bg, match)), 1
+
+def _rule_brain_bench(difficulty, cls=fg.VillainBrain):
+    def setup():
+        states = sample_states()
+        brain = cls(difficulty, rng=random.Random(0))
+        def op():
+            for m in states:
+                brain.action_cooldown = 0  # decide every call instead of replaying the held action
+                brain.decide_action(m.p2, m.p1)
+        return op, len(states)
+    return setup
+
+for _difficulty in ("Easy", "Medium", "Hard"):
+    benchmark(f"brain.rule.{_difficulty}")(_rule_brain_bench(_difficulty))
+    benchmark(f"brain.compiled.{_difficulty}")(_rule_brain_bench(_difficulty, fg.CompiledVillainBrain))
+
+@benchmark("brain.compiled.batch_1024")
+def bench_batch_brain():
+    n = 1024
+    batch = BatchMatch(n)
+    rng = np.random.default_rng(0)
+    for _ in range(30):  # spread the matches out
+        batch.step(rng.integers(0, len(fg.LearningVillainBrain.ACTIONS), n),
+                   rng.integers(0, len(fg.LearningVillainBrain.ACTIONS), n))
+    brain = BatchVillainBrain("Hard", n, seed=0)
+    return (lambda: brain.decide(batch, 1)), n
+
+@benchmark("brain.learning.decide+on_damage")
+def bench_learning():
+    states = sample_states()
+    brain = fg.LearningVillainBrain("Hard", seed=0)
+    def op():
+        for m in states:
+            brain.rule.action_cooldown = 0
+            brain.decide_action(m.p2, m.p1)
+            brain.on_damage(False, 8, m.p1, m.p2)
+    return op, len(states)
+
+@benchmark("sim.match_step")
+def bench_match_step():
+    rng = random.Random(0)
+    actions = [(rng.choice(fg.LearningVillainBrain.ACTIONS), rng.choice(fg.LearningVillainBrain.ACTIONS))
+               for _ in range(1000)]
+    def op():
+        match = fg.Match()
+        for a1, a2 in actions:
+            if match.game_over:
+                match = fg.Match()
+            match.step(a1, a2)
+    return op, len(actions)
+
+@benchmark("sim.headless_match_vs_brains")
+def bench_headless_match():
+    def op():
+        random.seed(0)
+        return fg.run_headless(fg.VillainBrain("Hard"), fg.VillainBrain("Medium"), max_frames=1000)
+    frames = op().frame
+    return op, frames
+
+@benchmark("sim.batch_step_1024")
+def bench_batch_step():
+    n = 1024
+    batch = BatchMatch(n)
+    actions = np.random.default_rng(0).integers(0, len(fg.LearningVillainBrain.ACTIONS), (2, n))
+    return (lambda: batch.step(actions[0], actions[1])), n
+
+@benchmark("sim.projectile_pool_256")
+def bench_projectile_pool():
+    pool = fg.ProjectilePool(256)
+    rects = (fg.pygame.Rect(200, 240, 150, 300), fg.pygame.Rect(600, 240, 150, 300))
+    rng = np.random.default_rng(0)
+    def op():
+        # keep the pool full: refill whatever was culled or hit last frame
+        while pool.free:
+            pool.spawn(int(rng.integers(-20, fg.WIDTH)), int(rng.integers(0, 200)), 1, 0)
+        pool.update()
+        pool.collide(rects)
+    return op, 1
+
+def run(names, repeat):
+    results = {}
+    for name in names:
+        op, per_call = BENCHMARKS[name]()
+        timer = timeit.Timer(op)
+        number, _ = timer.autorange()
+        best = min(timer.repeat(repeat=repeat, number=number)) / number
+        results[name] = per_call / best
+        print(f"{name:<34}{results[name]:>14,.0f} ops/s", flush=True)
+    return results
+
+def compare(results, baseline, threshold):
+    """Print current vs baseline; returns the names that got slower than threshold allows."""
+    regressions = []
+    print(f"\n{'BENCHMARK':<34}{'BASELINE':>14}{'NOW':>14}{'CHANGE':>9}")
+    for name, now in results.items():
+        if name not in baseline:
+            continue
+        before = baseline[name]
+        change = now / before - 1.0
+        flag = ""
+        if change < -threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<34}{before:>14,.0f}{now:>14,.0f}{100 * change:>8.1f}%{flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput benchmarks for render, AI and simulation hot paths.")
+    parser.add_argument("--only", nargs="*", default=None, help="benchmark names (prefix match)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--out", default=None, help="write results JSON here")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed slowdown before failing (0.10 = 10%%)")
+    args = parser.parse_args()
+
+    names = [n for n in BENCHMARKS if not args.only or any(n.startswith(p) for p in args.only)]
+    results = run(names, args.repeat)
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"\nBaseline saved to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline at {args.baseline} (use --save-baseline)")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} benchmark(s) slower than {100 * args.threshold:.0f}%: {', '.join(regressions)}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
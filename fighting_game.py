@@ -1,14 +1,38 @@
 import pygame
+import numpy as np
 import random
 import os
+import queue
+import csv
+import gc
+import hashlib
+import json
+import struct
+import threading
+import time
+import tracemalloc
+from bisect import bisect_right
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from operator import attrgetter
 
 # --- INITIALIZATION & CONSTANTS ---
-pygame.init()
 WIDTH, HEIGHT = 1400, 600
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("Street Fighter Style Engine")
-clock = pygame.time.Clock()
-FPS = 60
+FPS = 60                # Simulation tick rate: all physics constants are per tick
+SIM_DT = 1.0 / FPS
+RENDER_FPS = 120        # Draw rate cap, independent of the simulation
+MAX_FRAME_TIME = 0.25   # Longest real frame the sim will catch up on (avoids a death spiral)
+screen = None  # Created by init_display() so the sim can run without a window
+clock = None
+
+def init_display():
+    global screen, clock
+    pygame.init()
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    pygame.display.set_caption("Street Fighter Style Engine")
+    clock = pygame.time.Clock()
+    return screen
 
 # --- COLORS ---
 WHITE = (255, 255, 255)
@@ -29,6 +53,25 @@ JUMP_FORCE = -26        # Snappy jump
 ATTACK_COOLDOWN = 30    # Duration of attack animation
 SHOOT_DAMAGE = 25
 
+# --- INPUT BITS (held keys for one frame, packed into an int) ---
+INPUT_LEFT = 1
+INPUT_RIGHT = 2
+INPUT_JUMP = 4
+INPUT_PUNCH = 8
+INPUT_KICK = 16
+INPUT_SHOOT = 32
+INPUT_SHIELD = 64
+
+KEY_BINDINGS = {
+    pygame.K_LEFT: INPUT_LEFT,
+    pygame.K_RIGHT: INPUT_RIGHT,
+    pygame.K_UP: INPUT_JUMP,
+    pygame.K_a: INPUT_PUNCH,
+    pygame.K_d: INPUT_KICK,
+    pygame.K_s: INPUT_SHOOT,
+    pygame.K_w: INPUT_SHIELD,
+}
+
 # --- PERSISTENCE HELPER ---
 def enable_ai_shooting():
     if not os.path.exists("ai_memory.txt"):
@@ -36,51 +79,279 @@ def enable_ai_shooting():
             f.write("1")
 
 # --- HELPER FUNCTIONS ---
-def draw_text(text, size, color, x, y, align="center"):
-    font = pygame.font.SysFont("arial", size, bold=True)
-    render = font.render(text, True, color)
+TEXT_CACHE_SIZE = 256  # rendered strings kept; HUD + menu need only a few dozen
+
+@lru_cache(maxsize=None)
+def get_font(size):
+    # SysFont does a system font lookup; only do it once per size
+    return pygame.font.SysFont("arial", size, bold=True)
+
+@lru_cache(maxsize=TEXT_CACHE_SIZE)
+def render_text(text, size, color):
+    """Cached text Surface. Shared between callers, so never draw onto it."""
+    return get_font(size).render(text, True, color)
+
+def draw_text(text, size, color, x, y, align="center", surface=None):
+    render = render_text(text, size, tuple(color))
     rect = render.get_rect()
     if align == "center":
         rect.center = (x, y)
     elif align == "left":
         rect.topleft = (x, y)
-    screen.blit(render, rect)
+    return (surface or screen).blit(render, rect)
+
+def read_player_input(keys):
+    """Pack the pressed-key array from pygame.key.get_pressed() into INPUT_* bits."""
+    mask = 0
+    for key, bit in KEY_BINDINGS.items():
+        if keys[key]:
+            mask |= bit
+    return mask
 
 def draw_health_bar(surface, x, y, health, max_health, color):
     ratio = health / max_health
     # Border (Black)
-    pygame.draw.rect(surface, (0, 0, 0), (x - 2, y - 2, 304, 24), 3) 
+    border = pygame.draw.rect(surface, (0, 0, 0), (x - 2, y - 2, 304, 24), 3) 
     # Background (Dark Red)
     pygame.draw.rect(surface, (50, 0, 0), (x, y, 300, 20))
     # Health (Color)
     pygame.draw.rect(surface, color, (x, y, 300 * ratio, 20))
+    return border
+
+# --- SPRITE CACHE (shared by every SpriteAnimator in the process) ---
+SPRITE_ACTIONS = ["Idle", "Run", "Jump", "Punch", "Kick", "Shield", "Hurt", "Shoot"]
+CHARACTER_SCALES = {"Hero": 0.5, "Villain": 0.6}
+_animation_cache = {}
+
+def load_animations(character_name, scale):
+    """
+    Load and scale every frame for a character once, keyed by (character, scale).
+    Returns (right_facing, left_facing): two {action: [Surface, ...]} dicts.
+    """
+    key = (character_name, scale)
+    if key not in _animation_cache:
+        AssetLoader({character_name: scale}, background=False).wait()
+    return _animation_cache[key]
+
+def _sprite_paths(character_name):
+    """{action: [frame path, ...]}: frames are numbered from 0 with no gaps."""
+    paths = {}
+    for action in SPRITE_ACTIONS:
+        folder = f"assets/{character_name}/{action}"
+        names = set(os.listdir(folder)) if os.path.isdir(folder) else set()
+        paths[action] = []
+        for i in range(10): # Assume max 10 frames
+            if f"{i}.png" not in names: break
+            paths[action].append(f"{folder}/{i}.png")
+    return paths
+
+def _decode_frame(path, scale):
+    # Loader thread: decoding and scaling release the GIL. Converting to the
+    # display format needs the display, so that is left to the main thread.
+    img = pygame.image.load(path)
+    img = pygame.transform.scale(img, (int(img.get_width() * scale), int(img.get_height() * scale)))
+    return img, pygame.transform.flip(img, True, False)
+
+def _decode_background():
+    try:
+        bg = pygame.image.load("assets/background.png")
+    except FileNotFoundError:
+        bg = pygame.Surface((WIDTH, HEIGHT))
+        bg.fill(GRAY)
+    return pygame.transform.scale(bg, (WIDTH, HEIGHT))
+
+# --- SPRITE ATLAS CACHE (assets/.atlas: one prescaled sheet per character and scale) ---
+# <name>_<scale>.rgba holds every right-facing frame, shelf-packed, as raw RGBA
+# pixels (one read, no PNG decode). <name>_<scale>.json has the sheet size, the
+# action -> frame rects, and a hash of the source PNGs and scale: any edit to
+# a source frame changes the hash and the atlas is rebuilt.
+ATLAS_DIR = "assets/.atlas"
+ATLAS_VERSION = 1
+ATLAS_MAX_WIDTH = 4096
+
+def _atlas_base(character_name, scale):
+    return os.path.join(ATLAS_DIR, f"{character_name}_{scale}")
+
+def _sprite_hash(paths, scale):
+    h = hashlib.sha1(f"{ATLAS_VERSION}:{scale}".encode())
+    for action, files in paths.items():
+        for path in files:
+            h.update(path.encode())
+            with open(path, "rb") as f:
+                h.update(f.read())
+    return h.hexdigest()
+
+def _read_atlas(character_name, scale, paths):
+    """
+    Loader thread: (hash of the sources, (atlas Surface, {action: [rect, ...]})),
+    with None for the atlas if it is missing or stale (and for the hash if a source can't be read).
+    """
+    base = _atlas_base(character_name, scale)
+    digest = None
+    try:
+        digest = _sprite_hash(paths, scale)
+        with open(base + ".json") as f:
+            index = json.load(f)
+        if index["hash"] != digest:
+            return digest, None
+        with open(base + ".rgba", "rb") as f:
+            pixels = f.read()
+        return digest, (pygame.image.frombuffer(pixels, tuple(index["size"]), "RGBA"), index["frames"])
+    except (OSError, ValueError, KeyError, pygame.error):
+        return digest, None
+
+def _write_atlas(character_name, scale, digest, frames):
+    """
+    Loader thread: shelf-pack {action: [(RGBA bytes, (w, h)), ...]} into one sheet
+    and save it with its index. Works on plain bytes, so no Surface is shared.
+    """
+    rects, x, y, shelf, width = {}, 0, 0, 0, 1
+    for action, imgs in frames.items():
+        rects[action] = []
+        for _, (w, h) in imgs:
+            if x + w > ATLAS_MAX_WIDTH:
+                x, y, shelf = 0, y + shelf, 0
+            rects[action].append((x, y, w, h))
+            x += w
+            shelf = max(shelf, h)
+            width = max(width, x)
+    sheet = np.zeros((max(y + shelf, 1), width, 4), np.uint8)
+    for action, imgs in frames.items():
+        for (pixels, _), (x, y, w, h) in zip(imgs, rects[action]):
+            sheet[y:y + h, x:x + w] = np.frombuffer(pixels, np.uint8).reshape(h, w, 4)
+
+    base = _atlas_base(character_name, scale)
+    try:
+        os.makedirs(ATLAS_DIR, exist_ok=True)
+        with open(base + ".rgba", "wb") as f:
+            f.write(sheet.tobytes())
+        # Index last: a half-written atlas never has a matching index
+        with open(base + ".json", "w") as f:
+            json.dump({"hash": digest, "scale": scale, "size": (width, sheet.shape[0]), "frames": rects}, f)
+    except OSError:
+        pass  # read-only assets: just decode again next launch
+
+def _unpack_atlas(atlas, index):
+    """(right, left) action dicts of subsurfaces of the sheet and of its mirror image."""
+    atlas = atlas.convert_alpha()
+    mirror = pygame.transform.flip(atlas, True, False)
+    width = atlas.get_width()
+    right = {a: [atlas.subsurface(r) for r in rects] for a, rects in index.items()}
+    left = {a: [mirror.subsurface((width - x - w, y, w, h)) for x, y, w, h in rects]
+            for a, rects in index.items()}
+    return right, left
+
+# --- ASSET LOADER (thread pool, so the window keeps drawing while it works) ---
+class AssetLoader:
+    """
+    Loads every character's sprites (and the background) on a thread pool.
+    A character with an up-to-date atlas is one image load; otherwise its frames
+    are decoded and scaled one by one and the atlas is (re)built from them.
+    Call poll() once per frame from the main loop: it converts whatever has
+    finished and fills the sprite cache as each character completes.
+    """
+    def __init__(self, characters=CHARACTER_SCALES, background=True, workers=None):
+        self.pool = ThreadPoolExecutor(workers or min(8, (os.cpu_count() or 1) + 2))
+        self.chars = {}  # key -> (paths, atlas future, source hash), until that character is cached
+        self.jobs = []    # (future, key, action, frame index)
+        self.frames = {}  # key -> {action: [(right, left) or None, ...]}
+        self.total = 0    # progress is counted in frames
+        for name, scale in characters.items():
+            key = (name, scale)
+            if key in _animation_cache: continue
+            paths = _sprite_paths(name)
+            frames = sum(map(len, paths.values()))
+            if not frames:
+                # No sprites (missing folder, or run from elsewhere): SpriteAnimator draws a box
+                _animation_cache[key] = ({a: [] for a in paths}, {a: [] for a in paths})
+                continue
+            self.chars[key] = (paths, self.pool.submit(_read_atlas, name, scale, paths), None)
+            self.total += frames
+        self.bg_job = self.pool.submit(_decode_background) if background else None
+        self.background = None
+        self.total += 1 if background else 0
+        self.loaded = 0
+
+    @property
+    def done(self):
+        # Not self.loaded == self.total: that only counts frames, not pending characters
+        return not self.chars and not self.jobs and not self.frames and self.bg_job is None
+
+    @property
+    def progress(self):
+        return self.loaded / self.total if self.total else 1.0
+
+    def _decode_frames(self, key, paths):
+        # No usable atlas: one job per frame
+        self.frames[key] = {}
+        for action, files in paths.items():
+            self.frames[key][action] = [None] * len(files)
+            for i, path in enumerate(files):
+                self.jobs.append((self.pool.submit(_decode_frame, path, key[1]), key, action, i))
+
+    def poll(self):
+        """Collect finished work without blocking. Returns True once everything is loaded."""
+        for key, (paths, atlas_job, _) in list(self.chars.items()):
+            if atlas_job is None or not atlas_job.done(): continue
+            digest, cached = atlas_job.result()
+            self.chars[key] = (paths, None, digest)
+            if cached:
+                _animation_cache[key] = _unpack_atlas(*cached)
+                self.loaded += sum(map(len, paths.values()))
+                del self.chars[key]
+            else:
+                self._decode_frames(key, paths)
+
+        pending = []
+        for job in self.jobs:
+            future, key, action, i = job
+            if not future.done():
+                pending.append(job)
+                continue
+            right, left = future.result()
+            self.frames[key][action][i] = (right.convert_alpha(), left.convert_alpha())
+            self.loaded += 1
+        self.jobs = pending
+
+        for key in [k for k in self.frames if not any(j[1] == k for j in pending)]:
+            actions = self.frames.pop(key)
+            right = {a: [r for r, _ in f] for a, f in actions.items()}
+            _animation_cache[key] = (right, {a: [l for _, l in f] for a, f in actions.items()})
+            digest = self.chars.pop(key)[2]
+            if digest:
+                # Packing and the ~20 MB write happen on the pool, off the main thread
+                pixels = {a: [(pygame.image.tobytes(img, "RGBA"), img.get_size()) for img in imgs]
+                          for a, imgs in right.items()}
+                self.pool.submit(_write_atlas, key[0], key[1], digest, pixels)
+
+        if self.bg_job and self.bg_job.done():
+            self.background = self.bg_job.result().convert()
+            self.bg_job = None
+            self.loaded += 1
+
+        if self.done and self.pool:
+            self.pool.shutdown(wait=False)  # atlas writes finish in the background
+            self.pool = None
+        return self.done
+
+    def wait(self):
+        while not self.poll():
+            time.sleep(0.001)
+        return self
 
 # --- CLASS: SPRITE ANIMATOR ---
 class SpriteAnimator:
     def __init__(self, character_name, scale_factor=3.0):
         self.character_name = character_name
         self.scale = scale_factor
-        self.animation_list = {} 
         self.frame_index = 0
         self.action = "Idle" 
-        self.update_time = pygame.time.get_ticks()
-        self.cooldown = 80 # Speed of animation
+        self.update_time = 0
+        self.cooldown = 80 # Speed of animation (ms of sim time, see Fighter.clock)
+        self.sprite_rect = pygame.Rect(0, 0, 0, 0)  # reused by draw()
         
-        # Load sprites
-        actions = ["Idle", "Run", "Jump", "Punch", "Kick", "Shield", "Hurt", "Shoot"]
-        for action in actions:
-            temp_list = []
-            for i in range(10): # Assume max 10 frames
-                try:
-                    path = f"assets/{character_name}/{action}/{i}.png"
-                    img = pygame.image.load(path).convert_alpha()
-                    w = int(img.get_width() * self.scale)
-                    h = int(img.get_height() * self.scale)
-                    img = pygame.transform.scale(img, (w, h))
-                    temp_list.append(img)
-                except FileNotFoundError:
-                    break 
-            self.animation_list[action] = temp_list
+        # Load sprites (cached: restarts reuse the same Surfaces)
+        self.animation_list, self.flipped_list = load_animations(character_name, scale_factor)
 
     def get_state(self, fighter):
         if fighter.is_shielding: return "Shield"
@@ -101,14 +372,15 @@ class SpriteAnimator:
         if new_action != self.action:
             self.action = new_action
             self.frame_index = 0
-            self.update_time = pygame.time.get_ticks()
+            self.update_time = fighter.clock()
 
         current_animation = self.animation_list.get(self.action, self.animation_list["Idle"])
         if not current_animation: return
 
-        if pygame.time.get_ticks() - self.update_time > self.cooldown:
+        now = fighter.clock()
+        if now - self.update_time > self.cooldown:
             self.frame_index += 1
-            self.update_time = pygame.time.get_ticks()
+            self.update_time = now
             
             # One-Shot Animations (Don't Loop)
             if self.frame_index >= len(current_animation):
@@ -117,26 +389,32 @@ class SpriteAnimator:
                 else:
                      self.frame_index = 0 
 
-    def draw(self, surface, fighter):
-        current_animation = self.animation_list.get(self.action, self.animation_list["Idle"])
+    def draw(self, surface, fighter, rect=None):
+        rect = rect or fighter.rect  # interpolated position, when rendering between ticks
+        # Pre-flipped frames if facing left
+        frames = self.flipped_list if fighter.direction == -1 else self.animation_list
+        current_animation = frames.get(self.action, frames["Idle"])
         if not current_animation: 
             # Fallback if sprite missing
-            pygame.draw.rect(surface, fighter.color, fighter.rect)
-            return
+            return pygame.draw.rect(surface, fighter.color, rect)
 
         image = current_animation[self.frame_index]
-        
-        # Flip if facing left
-        if fighter.direction == -1:
-            image = pygame.transform.flip(image, True, False)
 
         # Center Sprite over Hitbox
-        sprite_rect = image.get_rect()
-        sprite_rect.centerx = fighter.rect.centerx
-        sprite_rect.bottom = fighter.rect.bottom 
-        surface.blit(image, sprite_rect)
+        sprite_rect = self.sprite_rect
+        sprite_rect.size = image.get_size()
+        sprite_rect.centerx = rect.centerx
+        sprite_rect.bottom = rect.bottom 
+        return surface.blit(image, sprite_rect)
+
+    def snapshot(self):
+        return self.action, self.frame_index, self.update_time
+
+    def restore(self, state):
+        self.action, self.frame_index, self.update_time = state
 
 class Projectile:
+    __slots__ = ("rect", "direction", "speed", "color", "active", "lifetime")
     sprite = None 
 
     def __init__(self, x, y, direction, owner_color):
@@ -148,12 +426,17 @@ class Projectile:
         self.lifetime = 0  # <--- NEW: Track how long it has been alive
 
         # Attempt to load sprite
+        Projectile.load_sprite()
+
+    @staticmethod
+    def load_sprite():
         if Projectile.sprite is None:
             try:
                 img = pygame.image.load("assets/dot.png").convert_alpha()
                 Projectile.sprite = pygame.transform.scale(img, (40, 40))
             except:
                 Projectile.sprite = None
+        return Projectile.sprite
 
     def update(self):
         self.rect.x += self.speed * self.direction
@@ -162,30 +445,176 @@ class Projectile:
         if self.rect.right < 0 or self.rect.left > WIDTH:
             self.active = False
 
-    def draw(self, surface):
+    def draw(self, surface, alpha=1.0):
+        # Interpolate back towards last tick's position
+        center = (self.rect.centerx - round(self.speed * self.direction * (1.0 - alpha)), self.rect.centery)
         # Always draw the yellow circle fallback first so we can see it
-        pygame.draw.circle(surface, (255, 255, 0), self.rect.center, 15) 
+        drawn = pygame.draw.circle(surface, (255, 255, 0), center, 15) 
         
         if Projectile.sprite:
             img_rect = Projectile.sprite.get_rect()
-            img_rect.center = self.rect.center
-            surface.blit(Projectile.sprite, img_rect)
+            img_rect.center = center
+            drawn = drawn.union(surface.blit(Projectile.sprite, img_rect))
+        return drawn
+
+    def snapshot(self):
+        return self.rect.x, self.rect.y, self.direction, self.lifetime, self.active
+
+    @classmethod
+    def from_snapshot(cls, state, color):
+        p = cls.__new__(cls)  # skips the sprite load in __init__
+        x, y, p.direction, p.lifetime, p.active = state
+        p.rect = pygame.Rect(x, y, 30, 30)
+        p.speed = 15
+        p.color = color
+        return p
+
+# --- CLASS: PROJECTILE POOL (multi-shot mode) ---
+# Preallocated struct-of-arrays storage for many projectiles at once. Movement,
+# off-screen culling and hit tests are single NumPy passes over the pool, so
+# per-frame cost stays flat as projectile counts grow.
+class ProjectilePool:
+    SIZE = 30
+    SPEED = 15
+
+    def __init__(self, capacity=512):
+        self.capacity = capacity
+        self.x = np.zeros(capacity, dtype=np.int32)
+        self.y = np.zeros(capacity, dtype=np.int32)
+        self.vx = np.zeros(capacity, dtype=np.int32)
+        self.lifetime = np.zeros(capacity, dtype=np.int32)
+        self.owner = np.zeros(capacity, dtype=np.int16)
+        self.active = np.zeros(capacity, dtype=bool)
+        self.free = list(range(capacity - 1, -1, -1))  # stack of unused slots
+
+    def __len__(self):
+        return self.capacity - len(self.free)
+
+    def spawn(self, x, y, direction, owner):
+        """Returns the slot used, or -1 when the pool is full."""
+        if not self.free:
+            return -1
+        i = self.free.pop()
+        self.x[i] = x
+        self.y[i] = y
+        self.vx[i] = self.SPEED * direction
+        self.lifetime[i] = 0
+        self.owner[i] = owner
+        self.active[i] = True
+        return i
+
+    def release(self, slots):
+        if len(slots):
+            self.active[slots] = False
+            self.free.extend(slots.tolist())
+
+    def _release(self, mask):
+        self.release(np.flatnonzero(mask))
+
+    def update(self):
+        """Move everything; returns the slots culled for leaving the screen."""
+        active = self.active
+        self.x += self.vx * active
+        self.lifetime += active
+        culled = np.flatnonzero(active & ((self.x + self.SIZE < 0) | (self.x > WIDTH)))
+        self.release(culled)
+        return culled
+
+    def nearest_threat(self, owner, x):
+        """Center-x distance from x to the closest live projectile not fired by owner, or None."""
+        if len(self.free) == self.capacity:
+            return None
+        live = self.active & (self.owner != owner)
+        if not live.any():
+            return None
+        return int(np.abs(self.x[live] + self.SIZE // 2 - x).min())
+
+    def collide(self, rects):
+        """
+        Hit-test every live projectile against rects[i] (fighter i), skipping
+        the shooter's own. Projectiles that hit are removed.
+        Returns the number of hits taken by each fighter.
+        """
+        hits = []
+        for i, r in enumerate(rects):
+            hit = (self.active & (self.owner != i)
+                   & (self.x < r.right) & (r.left < self.x + self.SIZE)
+                   & (self.y < r.bottom) & (r.top < self.y + self.SIZE))
+            hits.append(int(np.count_nonzero(hit)))
+            self._release(hit)
+        return hits
+
+    def collide_sorted(self, rects, owners):
+        """
+        collide() for many fighters: live projectiles are sorted by x once, and
+        each rect only tests the slice whose x-range can overlap it
+        (sort-and-sweep), instead of every projectile against every fighter.
+        Returns, per rect, the owners of the projectiles that hit it.
+        """
+        hits = [()] * len(rects)
+        slots = np.flatnonzero(self.active)
+        if not len(slots):
+            return hits
+        order = slots[np.argsort(self.x[slots], kind="stable")]
+        xs = self.x[order]
+        for k, (r, owner) in enumerate(zip(rects, owners)):
+            lo = np.searchsorted(xs, r.left - self.SIZE, side="right")  # x + SIZE > left
+            hi = np.searchsorted(xs, r.right, side="left")              # x < right
+            if lo >= hi:
+                continue
+            cand = order[lo:hi]
+            y = self.y[cand]
+            hit = cand[self.active[cand] & (self.owner[cand] != owner)
+                       & (y < r.bottom) & (r.top < y + self.SIZE)]
+            hits[k] = self.owner[hit].tolist()
+            self.release(hit)
+        return hits
+
+    def draw(self, surface, alpha=1.0):
+        """Returns the rects drawn."""
+        sprite = Projectile.load_sprite()
+        half = self.SIZE // 2
+        lag = 1.0 - alpha  # interpolate back towards last tick's position
+        drawn = []
+        for i in np.flatnonzero(self.active):
+            center = (int(self.x[i] - self.vx[i] * lag) + half, int(self.y[i]) + half)
+            drawn.append(pygame.draw.circle(surface, (255, 255, 0), center, 15))
+            if sprite:
+                drawn.append(surface.blit(sprite, sprite.get_rect(center=center)))
+        return drawn
+
+    def snapshot(self):
+        return (self.x.copy(), self.y.copy(), self.vx.copy(), self.lifetime.copy(),
+                self.owner.copy(), self.active.copy(), self.free[:])
+
+    def restore(self, state):
+        # Copy into the existing arrays: views handed out elsewhere stay valid
+        for dst, src in zip((self.x, self.y, self.vx, self.lifetime, self.owner, self.active), state):
+            np.copyto(dst, src)
+        self.free[:] = state[6]
                    
 # --- CLASS: FIGHTER ---
 class Fighter:
-    def __init__(self, x, y, color, is_ai=False):
+    def __init__(self, x, y, color, is_ai=False, headless=False, clock=None):
         self.rect = pygame.Rect(x, y, PLAYER_WIDTH, PLAYER_HEIGHT)
         self.color = color
         self.is_ai = is_ai
         self.is_running = False
-        # Visuals
-        char_name = "Villain" if is_ai else "Hero" 
-        s_fac = 0.5 if char_name == "Hero" else 0.6
-        self.animator = SpriteAnimator(char_name, scale_factor=s_fac)
+        # Milliseconds source for combo timing (Match passes its sim clock)
+        self.clock = clock or pygame.time.get_ticks
+        # Visuals (skipped headless: no window, no sprites)
+        if not headless:
+            char_name = "Villain" if is_ai else "Hero" 
+            self.animator = SpriteAnimator(char_name, scale_factor=CHARACTER_SCALES[char_name])
         
         # Physics
         self.vel_y = 0
         self.direction = 1 
+        self.prev_x, self.prev_y = x, y  # position at the previous tick (render interpolation)
+        # Scratch rects, updated in place each frame instead of allocated
+        self.hitbox = pygame.Rect(0, 0, 0, 0)
+        self.lerp_rect = pygame.Rect(self.rect)
+        self.attack_box = pygame.Rect(0, 0, 0, 0)
         self.health = 100
         
         # State
@@ -200,6 +629,8 @@ class Fighter:
         
         self.has_shot = False 
         self.projectile = None
+        self.projectile_pool = None  # set by Match in multi-shot mode
+        self.pool_owner = 0
         self.shoot_anim_frame = 0
         self.combo_count = 0 
         self.last_attack_time = 0
@@ -232,7 +663,7 @@ class Fighter:
         self.attack_frame = 20 # Locks character for 20 frames
 
         # --- COMBO LOGIC ---
-        current_time = pygame.time.get_ticks()
+        current_time = self.clock()
         # If last attack was less than 800ms ago, increment combo
         if current_time - self.last_attack_time < 800:
             self.combo_count = min(self.combo_count + 1, 3) # Max 3 hits
@@ -242,6 +673,14 @@ class Fighter:
         self.last_attack_time = current_time
         
     def shoot(self):
+        if self.projectile_pool is not None:
+            # Multi-shot: fire again once the shoot animation has finished
+            if self.shoot_anim_frame == 0 and not self.is_attacking and not self.is_shielding:
+                self.shoot_anim_frame = 20
+                start_x = self.rect.right if self.direction == 1 else self.rect.left
+                slot = self.projectile_pool.spawn(start_x, self.rect.centery - 75, self.direction, self.pool_owner)
+                return slot >= 0
+            return False
         if not self.has_shot and not self.is_attacking and not self.is_shielding:
             self.has_shot = True
             self.shoot_anim_frame = 20
@@ -291,7 +730,8 @@ class Fighter:
                 else:
                     hb_x = self.rect.left - reach
                     
-                hitbox = pygame.Rect(hb_x, self.rect.y + 20, reach, 50)
+                hitbox = self.hitbox
+                hitbox.update(hb_x, self.rect.y + 20, reach, 50)
             
             if self.attack_frame <= 0:
                 self.is_attacking = False
@@ -308,6 +748,37 @@ class Fighter:
 
         return hitbox
 
+    def save_prev(self):
+        self.prev_x, self.prev_y = self.rect.x, self.rect.y
+
+    def render_rect(self, alpha=1.0):
+        """Body rect blended between the previous and current tick (alpha 0..1)."""
+        if alpha >= 1.0:
+            return self.rect
+        r = self.lerp_rect
+        r.x = round(self.prev_x + (self.rect.x - self.prev_x) * alpha)
+        r.y = round(self.prev_y + (self.rect.y - self.prev_y) * alpha)
+        return r
+
+    # Everything that changes while a match runs (see snapshot/restore)
+    STATE_FIELDS = ("vel_y", "direction", "prev_x", "prev_y", "health", "is_running",
+                    "is_attacking", "attack_type", "attack_frame", "has_hit",
+                    "is_shielding", "shield_gauge", "shield_cooldown", "has_shot",
+                    "shoot_anim_frame", "combo_count", "last_attack_time")
+    _get_state = staticmethod(attrgetter(*STATE_FIELDS))
+
+    def snapshot(self):
+        """Compact tuple of this fighter's frame state, for restore()."""
+        return (self.rect.x, self.rect.y, self._get_state(self),
+                self.projectile.snapshot() if self.projectile else None,
+                self.animator.snapshot() if hasattr(self, 'animator') else None)
+
+    def restore(self, state):
+        self.rect.x, self.rect.y, fields, projectile, anim = state
+        self.__dict__.update(zip(self.STATE_FIELDS, fields))
+        self.projectile = Projectile.from_snapshot(projectile, self.color) if projectile else None
+        if anim: self.animator.restore(anim)
+
     def take_damage(self, amount, is_unblockable=False):
         if self.is_shielding and not is_unblockable:
             self.shield_gauge -= amount * 2
@@ -316,9 +787,12 @@ class Fighter:
             self.health -= amount
             return True 
 
-    def draw(self, surface):
+    def draw(self, surface, alpha=1.0):
+        """Returns the rects drawn (for dirty-rect rendering)."""
+        rect = self.render_rect(alpha)
+        drawn = []
         if hasattr(self, 'animator'):
-            self.animator.draw(surface, self)
+            drawn.append(self.animator.draw(surface, self, rect))
         
         # if self.is_shielding:
         #     pygame.draw.circle(surface, (100, 200, 255), self.rect.center, 70, 4)
@@ -328,7 +802,7 @@ class Fighter:
         char_name = "Villain" if self.is_ai else "Hero" 
         side = 20 if char_name == "Hero" else 1070
         clr = (255, 0, 0) if char_name == "Hero" else (255, 255, 255)
-        draw_health_bar(surface, side, 50, self.health, 100, clr)
+        drawn.append(draw_health_bar(surface, side, 50, self.health, 100, clr))
 
         # --- DEBUG: Draw Attack Hitbox (Red) ---
         # This calculates the box exactly like 'update' does so you can see it
@@ -337,29 +811,47 @@ class Fighter:
             if self.combo_count == 3: reach += 20
             
             if self.direction == 1:
-                hb_x = self.rect.right
+                hb_x = rect.right
             else:
-                hb_x = self.rect.left - reach
+                hb_x = rect.left - reach
             
-            attack_box = pygame.Rect(hb_x, self.rect.y + 20, reach, 50)
-            pygame.draw.rect(surface, (255, 0, 0), attack_box, 2)
+            attack_box = self.attack_box
+            attack_box.update(hb_x, rect.y + 20, reach, 50)
+            drawn.append(pygame.draw.rect(surface, (255, 0, 0), attack_box, 2))
         # ---------------------------------------
 
 
         if self.projectile:
-            self.projectile.draw(surface)
+            drawn.append(self.projectile.draw(surface, alpha))
         
-        pygame.draw.rect(surface, (0, 255, 0), self.rect, 2)
+        drawn.append(pygame.draw.rect(surface, (0, 255, 0), rect, 2))
         
         # Minimal HUD above head
-        pygame.draw.rect(surface, RED, (self.rect.x, self.rect.y - 20, 50, 5))
-        pygame.draw.rect(surface, GREEN, (self.rect.x, self.rect.y - 20, 50 * (self.health/100), 5))
-        pygame.draw.rect(surface, BLUE, (self.rect.x, self.rect.y - 10, 50 * (self.shield_gauge/100), 3))
+        drawn.append(pygame.draw.rect(surface, RED, (rect.x, rect.y - 20, 50, 5)))
+        pygame.draw.rect(surface, GREEN, (rect.x, rect.y - 20, 50 * (self.health/100), 5))
+        drawn.append(pygame.draw.rect(surface, BLUE, (rect.x, rect.y - 10, 50 * (self.shield_gauge/100), 3)))
+        return drawn
+
+# --- RANDOMNESS ---
+class GlobalRandom:
+    """Picklable stand-in for the global random module (brains' default rng)."""
+    def random(self): return random.random()
+    def choice(self, seq): return random.choice(seq)
 
 # --- CLASS: VILLAIN BRAIN (Custom Logic + Persistence Fix) ---
 class VillainBrain:
-    def __init__(self, difficulty):
+    # Hard-mode odds and the fireball warning distance (AdaptiveVillainBrain
+    # retunes these every frame; compile_policy() reads the defaults)
+    punch_chance = 0.9
+    kick_chance = 0.85
+    approach_chance = 0.06
+    proj_threat_range = 200
+
+    def __init__(self, difficulty, rng=None):
         self.difficulty = difficulty
+        # Source of randomness: the global module by default, or a seeded
+        # random.Random for deterministic matches
+        self.rng = rng or GlobalRandom()
         self.action_cooldown = 0
         self.state_buffer = "IDLE"
         
@@ -394,6 +886,16 @@ class VillainBrain:
         if run_away_dir == "LEFT" and villain.rect.left < 100: is_cornered = True
         if run_away_dir == "RIGHT" and villain.rect.right > 1300: is_cornered = True
 
+        # Incoming fireball close by?
+        proj_threat = False
+        if villain.projectile_pool is not None:
+            # Multi-shot: shots live in the pool, not in player.projectile
+            proj_dist = villain.projectile_pool.nearest_threat(villain.pool_owner, villain.rect.centerx)
+            proj_threat = proj_dist is not None and proj_dist < self.proj_threat_range
+        elif player.projectile and player.projectile.active:
+            proj_dist = abs(villain.rect.centerx - player.projectile.rect.centerx)
+            proj_threat = proj_dist < self.proj_threat_range
+
         # 3. REFLEX SYSTEM (Wake up if threatened!)
         # If waiting, but player attacks close by, interrupt the wait.
         if self.action_cooldown > 0:
@@ -401,9 +903,7 @@ class VillainBrain:
                 self.action_cooldown = 0
             
             # Hard mode projectile reflex
-            if self.difficulty == "Hard" and player.projectile and player.projectile.active:
-                 proj_dist = abs(villain.rect.centerx - player.projectile.rect.centerx)
-                 if proj_dist < 200: self.action_cooldown = 0
+            if self.difficulty == "Hard" and proj_threat: self.action_cooldown = 0
 
         # 4. COOLDOWN & PERSISTENCE CHECK (CRITICAL FIX)
         # If cooldown is active, KEEP DOING what we decided last time (Buffer)
@@ -415,8 +915,17 @@ class VillainBrain:
             return "IDLE" 
 
         # 5. DECISION LOGIC
+        final_action, self.action_cooldown = self._decide(
+            gap, run_away_dir, run_towards_dir, is_player_attacking, can_shield,
+            is_cornered, villain.has_shot, proj_threat)
+        self.state_buffer = final_action
+        return final_action
+
+    def _decide(self, gap, run_away_dir, run_towards_dir, is_player_attacking, can_shield,
+                is_cornered, has_shot, proj_threat):
+        """The difficulty rules proper. Returns (action, frames to hold it)."""
         final_action = "IDLE"
-        self.action_cooldown = self.reaction_delay 
+        cooldown = self.reaction_delay 
 
         # =================================================================
         # --- EASY MODE ---
@@ -426,10 +935,10 @@ class VillainBrain:
             if is_player_attacking:
                 if can_shield:
                     final_action = "SHIELD"
-                    self.action_cooldown = 30 # Hold shield
-                elif random.random() < 0.3: # Rare chance to move away
+                    cooldown = 30 # Hold shield
+                elif self.rng.random() < 0.3: # Rare chance to move away
                     final_action = run_away_dir
-                    self.action_cooldown = 20
+                    cooldown = 20
             else:
                 final_action = "IDLE"
 
@@ -442,16 +951,16 @@ class VillainBrain:
             
             # A. EMERGENCY EVASION (Attacked + NO Shield)
             if is_player_attacking and gap < 80 and not can_shield:
-                if random.random() < 0.5:
+                if self.rng.random() < 0.5:
                     final_action = "JUMP" # Jump in place (or directional if moving)
                 else:
                     final_action = run_away_dir
-                self.action_cooldown = 15
+                cooldown = 15
 
             # B. DEFENSE (Attacked + Shield Available) -> "Shield Extensively"
             elif is_player_attacking and gap < 120 and can_shield:
                 final_action = "SHIELD"
-                self.action_cooldown = 45 # Hold it longer for "extensive" feel
+                cooldown = 45 # Hold it longer for "extensive" feel
 
             # C. OFFENSE 1: Counter Attack (Player near, NOT attacking = Gap)
             elif not is_player_attacking and gap < 80:
@@ -463,14 +972,14 @@ class VillainBrain:
             elif gap < 70: final_action = "KICK"
             
             # E. RANDOM SHOOT
-            elif gap > 200 and not villain.has_shot and random.random() < 0.02:
+            elif gap > 200 and not has_shot and self.rng.random() < 0.02:
                 final_action = "SHOOT"
 
             # F. SPACING (Move away or Jump in place)
             elif gap < 60:
-                if random.random() < 0.1: final_action = "JUMP"
+                if self.rng.random() < 0.1: final_action = "JUMP"
                 else: final_action = run_away_dir
-                self.action_cooldown = 10
+                cooldown = 10
 
         # =================================================================
         # --- HARD MODE (Solid Defense / Aggressive Counter) ---
@@ -478,17 +987,14 @@ class VillainBrain:
         elif self.difficulty == "Hard":
             
             # 1. PROJECTILE DEFENSE
-            if player.projectile and player.projectile.active:
-                proj_dist = abs(villain.rect.centerx - player.projectile.rect.centerx)
-                if proj_dist < 200:
-                    if can_shield:
-                        final_action = "SHIELD"
-                        self.action_cooldown = 20
-                    else:
-                        final_action = "JUMP"
-                        self.action_cooldown = 15
-                    self.state_buffer = final_action
-                    return final_action
+            if proj_threat:
+                if can_shield:
+                    final_action = "SHIELD"
+                    cooldown = 20
+                else:
+                    final_action = "JUMP"
+                    cooldown = 15
+                return final_action, cooldown
 
             # 2. IMMEDIATE THREAT REACTION (Strict & Glitch-Free)
             if is_player_attacking and gap < 120:
@@ -497,123 +1003,418 @@ class VillainBrain:
                 # Don't "maybe" jump. Just block the attack.
                 if can_shield:
                     final_action = "SHIELD"
-                    self.action_cooldown = 20 # Hold the block
+                    cooldown = 20 # Hold the block
                 
                 # LOGIC RULE: Shield is broken/empty -> MUST ESCAPE.
                 # No attacking allowed here. Survival only.
                 else:
                     if is_cornered:
-                         final_action = "JUMP"
-                         self.state_buffer = run_towards_dir # Cross-up jump
-                         self.action_cooldown = 20 
+                         final_action = "JUMP" # Cross-up jump
+                         cooldown = 20 
                     else:
                         # Mix up escape options so it's not predictable, 
                         # but ALWAYS escape.
-                        if random.random() < 0.5:
+                        if self.rng.random() < 0.5:
                             final_action = "JUMP"
                         else:
                             final_action = run_away_dir
-                        self.action_cooldown = 15
+                        cooldown = 15
             
             # 3. OFFENSIVE PHASE (Only when NOT under pressure)
             
             # A. CLOSE RANGE (Punch Range)
             elif gap < 50:
                 # 90% Aggression
-                if random.random() < 0.9:
+                if self.rng.random() < self.punch_chance:
                     final_action = "PUNCH"
                 else:
                     final_action = run_away_dir 
-                    self.action_cooldown = 8 
+                    cooldown = 8 
 
             # B. MID RANGE (Kick Range)
             elif gap < 90:
                 # 85% Aggression
-                if random.random() < 0.85:
+                if self.rng.random() < self.kick_chance:
                     final_action = "KICK"
                 else:
                     final_action = run_away_dir 
-                    self.action_cooldown = 10
+                    cooldown = 10
 
             # 4. NEUTRAL / APPROACH
             else:
                 # Aggressive Approach (Stalking)
                 # 6% Chance per frame to close in.
-                if random.random() < 0.06: 
+                if self.rng.random() < self.approach_chance: 
                     final_action = run_towards_dir
-                    self.action_cooldown = 20 
+                    cooldown = 20 
                 
                 # Fireball
-                elif gap > 350 and not villain.has_shot and random.random() < 0.08:
+                elif gap > 350 and not has_shot and self.rng.random() < 0.08:
                     final_action = "SHOOT"
                 
                 # Maintain Spacing
                 elif gap < 60:
                     final_action = run_away_dir
-                    self.action_cooldown = 8
+                    cooldown = 8
                 
                 # Ready
                 else:
                     final_action = "IDLE"
-                    self.action_cooldown = 5
+                    cooldown = 5
+
+
+        return final_action, cooldown
+
+# --- CLASS: COMPILED VILLAIN BRAIN (rules as a lookup table) ---
+# VillainBrain._decide only looks at a handful of flags and at gap against fixed
+# thresholds, so every input it can see falls into one of N_STATES cells. Each
+# cell is compiled once per difficulty, by running the rules themselves down
+# every rng branch, into a distribution over (action, cooldown) outcomes.
+# Deciding is then one table index and at most one random draw.
+
+# Every gap threshold _decide tests: "gap < t" splits at t, "gap > t" at t + 1
+GAP_EDGES = (40, 50, 60, 70, 80, 90, 120, 201, 351)
+AWAY, TOWARDS = "AWAY", "TOWARDS"  # placeholders for run_away_dir / run_towards_dir
+
+class _BranchProbe:
+    """
+    rng stand-in that walks _decide down one forced branch path. random() returns
+    draws whose "< p" answers come from path; past its end they answer True
+    and record p, so the caller can queue the False side too.
+    """
+    def __init__(self):
+        self.path = []
+        self.taken = []  # (p, answer) for every draw in the last run
+
+    def random(self):
+        return _Draw(self)
+
+class _Draw:
+    def __init__(self, probe):
+        self.probe = probe
+
+    def __lt__(self, p):
+        probe = self.probe
+        k = len(probe.taken)
+        answer = probe.path[k] if k < len(probe.path) else True
+        probe.taken.append((p, answer))
+        return answer
+
+@lru_cache(maxsize=None)
+def compile_policy(difficulty):
+    """Per state cell: (cumulative probabilities, outcomes) for CompiledVillainBrain."""
+    probe = _BranchProbe()
+    rules = VillainBrain(difficulty, rng=probe)
+    table = []
+    for state in range(CompiledVillainBrain.N_STATES):
+        bucket, flags = divmod(state, 32)
+        gap = GAP_EDGES[bucket - 1] if bucket else 0
+        attacking, can_shield, cornered, has_shot, proj_threat = ((flags >> b) & 1 for b in (4, 3, 2, 1, 0))
+        dist = {}
+        paths = [[]]
+        while paths:
+            probe.path, probe.taken = paths.pop(), []
+            outcome = rules._decide(gap, AWAY, TOWARDS, bool(attacking), bool(can_shield),
+                                    bool(cornered), bool(has_shot), bool(proj_threat))
+            prob = 1.0
+            for k, (p, answer) in enumerate(probe.taken):
+                if k >= len(probe.path):
+                    paths.append([a for _, a in probe.taken[:k]] + [False])
+                prob *= p if answer else 1.0 - p
+            dist[outcome] = dist.get(outcome, 0.0) + prob
+        outcomes = tuple(dist)
+        cum, total = [], 0.0
+        for o in outcomes[:-1]:
+            total += dist[o]
+            cum.append(total)
+        table.append((tuple(cum), outcomes))
+    return tuple(table)
+
+@lru_cache(maxsize=None)
+def policy_cells(difficulty):
+    """
+    compile_policy() as nested tuples, for CompiledVillainBrain._decide:
+    cells[gap][attacking][can_shield][cornered][has_shot][proj_threat][run_away_dir == "LEFT"]
+    is (None, outcome) for a certain outcome, else (cumulative probabilities, outcomes),
+    with AWAY / TOWARDS already turned into directions.
+    """
+    def cell(cum, outcomes, away, towards):
+        resolved = tuple((away if a == AWAY else towards if a == TOWARDS else a, c) for a, c in outcomes)
+        return (cum, resolved) if cum else (None, resolved[0])
+
+    def subtree(row, depth):
+        # depth 5 flags (attacking first), then the facing
+        if depth == 5:
+            cum, outcomes = compile_policy(difficulty)[row]
+            return (cell(cum, outcomes, "RIGHT", "LEFT"), cell(cum, outcomes, "LEFT", "RIGHT"))
+        bit = 16 >> depth
+        return (subtree(row, depth + 1), subtree(row + bit, depth + 1))
+
+    buckets = [subtree(b * 32, 0) for b in range(len(GAP_EDGES) + 1)]
+    return tuple(buckets[bisect_right(GAP_EDGES, g)] for g in range(WIDTH + 1))
+
+# Outcome codes in policy_arrays() besides LearningVillainBrain.ACTIONS indices
+POLICY_AWAY, POLICY_TOWARDS = -1, -2
+
+@lru_cache(maxsize=None)
+def policy_arrays(difficulty):
+    """
+    compile_policy() as (cum, action, cooldown) arrays of shape (N_STATES, K), for
+    deciding many matches at once (see batch_env.BatchVillainBrain). For a uniform
+    draw u, the outcome index is the count of cum[state] <= u; unused slots hold inf.
+    """
+    table = compile_policy(difficulty)
+    k = max(len(outcomes) for _, outcomes in table)
+    cum = np.full((len(table), k), np.inf)
+    action = np.full((len(table), k), LearningVillainBrain.ACTION_INDEX["IDLE"], np.int8)
+    cooldown = np.zeros((len(table), k), np.int64)
+    codes = dict(LearningVillainBrain.ACTION_INDEX, **{AWAY: POLICY_AWAY, TOWARDS: POLICY_TOWARDS})
+    for state, (c, outcomes) in enumerate(table):
+        cum[state, :len(c)] = c
+        for i, (a, hold) in enumerate(outcomes):
+            action[state, i] = codes[a]
+            cooldown[state, i] = hold
+    for arr in (cum, action, cooldown):
+        arr.flags.writeable = False  # shared through the cache
+    return cum, action, cooldown
+
+class CompiledVillainBrain(VillainBrain):
+    """VillainBrain with the same reflexes and persistence, deciding from compile_policy()."""
+    N_STATES = (len(GAP_EDGES) + 1) * 32  # gap bucket x 5 flags
+
+    def __init__(self, difficulty, rng=None):
+        super().__init__(difficulty, rng)
+        self.cells = policy_cells(difficulty)
+
+    # gap -> row offset of its bucket, for every gap up to the last edge
+    GAP_ROWS = tuple(bisect_right(GAP_EDGES, g) * 32 for g in range(GAP_EDGES[-1] + 1))
+
+    @classmethod
+    def state_index(cls, gap, is_player_attacking, can_shield, is_cornered, has_shot, proj_threat):
+        return (cls.GAP_ROWS[min(gap, GAP_EDGES[-1])] + is_player_attacking * 16 + can_shield * 8
+                + is_cornered * 4 + has_shot * 2 + proj_threat)
+
+    def _decide(self, gap, run_away_dir, run_towards_dir, is_player_attacking, can_shield,
+                is_cornered, has_shot, proj_threat):
+        # Plain subscripts (bools index as 0/1): cheaper than building state_index
+        cum, outcome = self.cells[gap][is_player_attacking][can_shield][is_cornered][has_shot][
+            proj_threat][run_away_dir == "LEFT"]
+        if cum is None:
+            return outcome
+        return outcome[bisect_right(cum, self.rng.random())]
+
+# --- CLASS: PLAYER MODEL (sliding-window stats, O(1) per frame) ---
+# Each frame's sample goes into fixed-size rings; running totals add the new
+# sample and subtract the one it overwrites. Samples are ints, so the totals
+# never drift, and memory is the same after one minute or ten hours of play.
+class PlayerModel:
+    def __init__(self, window=FPS * 8):
+        self.window = window
+        self.pos = 0
+        self.count = 0  # samples in the window (< window only at the start)
+        self.attacks = [0] * window  # 1 on the frame an attack starts
+        self.shots = [0] * window    # 1 on the frame a shot is fired
+        self.shields = [0] * window  # 1 while shielding
+        self.gaps = [0] * window     # distance between the fighters
+        self.n_attacks = self.n_shots = self.n_shield = self.gap_total = 0
+        self._was_attacking = False
+        self._shoot_anim = 0
+
+    def observe(self, player, gap):
+        attack = int(player.is_attacking and not self._was_attacking)
+        shot = int(player.shoot_anim_frame > self._shoot_anim)  # the animation restarts on a shot
+        shield = int(player.is_shielding)
+        self._was_attacking = player.is_attacking
+        self._shoot_anim = player.shoot_anim_frame
+
+        i = self.pos
+        self.n_attacks += attack - self.attacks[i]
+        self.n_shots += shot - self.shots[i]
+        self.n_shield += shield - self.shields[i]
+        self.gap_total += gap - self.gaps[i]
+        self.attacks[i], self.shots[i], self.shields[i], self.gaps[i] = attack, shot, shield, gap
+        self.pos = (i + 1) % self.window
+        if self.count < self.window: self.count += 1
+
+    # Rates are per second of play in the window
+    @property
+    def attack_rate(self):
+        return self.n_attacks * FPS / max(self.count, 1)
+
+    @property
+    def shot_rate(self):
+        return self.n_shots * FPS / max(self.count, 1)
+
+    @property
+    def shield_share(self):
+        return self.n_shield / max(self.count, 1)
+
+    @property
+    def mean_gap(self):
+        return self.gap_total / max(self.count, 1)
+
+# --- CLASS: ADAPTIVE VILLAIN BRAIN ---
+# Hard-mode rules, retuned every frame from a PlayerModel of the human:
+#   attack rate   -> reaction delay: 15 frames (Medium) vs a passive player, 0 vs a busy one
+#   mean gap      -> stalking: players who keep their distance get chased down
+#   shield share  -> fewer punches/kicks into a raised shield
+#   shot rate     -> fireballs are noticed from further away
+class AdaptiveVillainBrain(VillainBrain):
+    FULL_ATTACK_RATE = 1.5  # attacks/s at which reactions are fastest
+    FULL_SHOT_RATE = 0.5    # shots/s at which fireball warning is longest
+    FAR_GAP = 600
+
+    def __init__(self, rng=None, window=FPS * 8):
+        super().__init__("Hard", rng)
+        self.model = PlayerModel(window)
+        self.adapt()
+
+    def adapt(self):
+        m = self.model
+        busy = min(m.attack_rate / self.FULL_ATTACK_RATE, 1.0)
+        self.reaction_delay = round(15 * (1.0 - busy))
+        self.approach_chance = 0.06 + 0.1 * min(m.mean_gap / self.FAR_GAP, 1.0)
+        wary = 1.0 - 0.4 * m.shield_share
+        self.punch_chance = 0.9 * wary
+        self.kick_chance = 0.85 * wary
+        self.proj_threat_range = 200 + 150 * min(m.shot_rate / self.FULL_SHOT_RATE, 1.0)
 
+    def decide_action(self, villain, player):
+        self.model.observe(player, max(0, abs(villain.rect.centerx - player.rect.centerx) - PLAYER_WIDTH))
+        self.adapt()
+        return super().decide_action(villain, player)
+
+# --- CLASS: REPLAY BUFFER (fixed-capacity ring of transitions) ---
+class ReplayBuffer:
+    def __init__(self, capacity, seed=None):
+        self.capacity = capacity
+        self.states = np.zeros(capacity, dtype=np.int32)
+        self.actions = np.zeros(capacity, dtype=np.int8)
+        self.rewards = np.zeros(capacity, dtype=np.float32)
+        self.next_states = np.zeros(capacity, dtype=np.int32)
+        self.pos = 0     # next slot to overwrite
+        self.size = 0
+        # seed=None follows the global random module, so random.seed() still pins the batches
+        self.rng = np.random.default_rng(random.getrandbits(64) if seed is None else seed)
+
+    def __len__(self):
+        return self.size
+
+    def push(self, state, action, reward, next_state):
+        i = self.pos
+        self.states[i] = state
+        self.actions[i] = action
+        self.rewards[i] = reward
+        self.next_states[i] = next_state
+        self.pos = (i + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def sample(self, batch_size):
+        """Uniform random batch as (states, actions, rewards, next_states) arrays."""
+        idx = self.rng.integers(0, self.size, batch_size)
+        return self.states[idx], self.actions[idx], self.rewards[idx], self.next_states[idx]
+
+def default_learn_weight(steps):
+    # controls how quickly learned policy overtakes rule-based: grows with steps
+    return min(0.05 + steps / 4000.0, 0.9)
+
+class LinearLearnWeight:
+    """default_learn_weight with tunable numbers: start + steps / ramp, capped (picklable)."""
+    def __init__(self, start=0.05, ramp=4000.0, cap=0.9):
+        self.start, self.ramp, self.cap = start, ramp, cap
+
+    def __call__(self, steps):
+        return min(self.start + steps / self.ramp, self.cap)
+
+    def __repr__(self):
+        return f"LinearLearnWeight({self.start}, {self.ramp}, {self.cap})"
 
-        self.state_buffer = final_action
-        return final_action
-    
 class LearningVillainBrain:
     ACTIONS = ["LEFT", "RIGHT", "JUMP", "PUNCH", "KICK", "SHIELD", "SHOOT", "IDLE"]
-
-    def __init__(self, difficulty, lr=0.12, gamma=0.9, eps_start=0.35):
-        self.rule = VillainBrain(difficulty)         # keep original rule-based brain
+    ACTION_INDEX = {a: i for i, a in enumerate(ACTIONS)}
+
+    # State = (distance bucket, player attacking, player projectile, shield > 20, cornered)
+    DIST_BUCKETS = WIDTH // 50 + 1
+    N_STATES = DIST_BUCKETS * 2 * 2 * 2 * 2
+
+    def __init__(self, difficulty, lr=0.12, gamma=0.9, eps_start=0.35,
+                 replay_capacity=50_000, replay_every=30, replay_batch=256, seed=None,
+                 learn_weight=default_learn_weight):
+        # seed=None draws from the global random module; an int makes the brain deterministic
+        self.rng = GlobalRandom() if seed is None else random.Random(seed)
+        self.rule = VillainBrain(difficulty, rng=self.rng)  # keep original rule-based brain
         self.lr = lr
         self.gamma = gamma
         self.epsilon = eps_start                     # exploration for learned policy
-        self.q = defaultdict(lambda: defaultdict(float))
+        # Dense Q-table: one row per state index, one column per action
+        self.q = np.zeros((self.N_STATES, len(self.ACTIONS)), dtype=np.float32)
+        self.dirty = np.zeros(self.N_STATES, dtype=bool)  # rows changed since last checkpoint
         self.steps = 0
         self.last_state = None
         self.last_action = None
-        # controls how quickly learned policy overtakes rule-based: grows with steps
-        self.learn_weight_schedule = lambda s: min(0.05 + s / 4000.0, 0.9)
+        self.learn_weight_schedule = learn_weight  # steps -> chance of using the learned policy
+
+        # Experience replay: every frame's transition is recorded, and a random
+        # batch is replayed every `replay_every` frames. replay_capacity=0 turns
+        # it off (damage then only credits the last action, via on_damage).
+        self.replay = ReplayBuffer(replay_capacity, seed) if replay_capacity else None
+        self.replay_every = replay_every
+        self.replay_batch = replay_batch
+        self.pending_reward = 0.0  # damage reward since the last decision
+        self.training = True
+
+    def evaluate(self):
+        """Play-only mode for matches that measure the brain: no exploration, replay or updates."""
+        self.training = False
+        self.epsilon = 0.0
+        self.replay = None
+        return self
+
+    @classmethod
+    def state_index(cls, dist_bucket, player_attacking, player_projectile, has_shield, cornered):
+        """Pack the discrete state into a row of self.q. Works on ints or NumPy arrays."""
+        dist_bucket = np.minimum(dist_bucket, cls.DIST_BUCKETS - 1)
+        return (((dist_bucket * 2 + player_attacking) * 2 + player_projectile) * 2 + has_shield) * 2 + cornered
 
     def _bucket_distance(self, villain, player):
         dist = abs(villain.rect.centerx - player.rect.centerx)
         return int(dist // 50)   # coarse buckets (0..)
 
     def _encode_state(self, villain, player):
-        return (
+        pool = villain.projectile_pool
+        if pool is not None:
+            incoming = pool.nearest_threat(villain.pool_owner, villain.rect.centerx) is not None
+        else:
+            incoming = player.projectile and player.projectile.active
+        return int(self.state_index(
             self._bucket_distance(villain, player),
             1 if player.is_attacking else 0,
-            1 if (player.projectile and player.projectile.active) else 0,
+            1 if incoming else 0,
             1 if (villain.shield_gauge > 20) else 0,
             int(villain.rect.left < 120 or villain.rect.right > (WIDTH - 120))  # cornered flag
-        )
+        ))
 
     def _argmax_q(self, state):
-        best = None
-        best_v = -1e9
-        for a in self.ACTIONS:
-            v = self.q[state][a]
-            if v > best_v:
-                best_v = v
-                best = a
-        # fallback
-        return best if best is not None else "IDLE"
+        # ties go to the first action, like the original ACTIONS-order scan
+        return self.ACTIONS[int(self.q[state].argmax())]
 
     def _epsilon_greedy(self, state):
-        if random.random() < self.epsilon:
-            return random.choice(self.ACTIONS)
+        if self.rng.random() < self.epsilon:
+            return self.rng.choice(self.ACTIONS)
         return self._argmax_q(state)
 
     def decide_action(self, villain, player):
         state = self._encode_state(villain, player)
-        self.steps += 1
+        if self.training:
+            self.steps += 1
+        if self.replay is not None:
+            self._record(state)
 
         # decide how much to prefer learned policy over rule-based
         learn_weight = self.learn_weight_schedule(self.steps)
 
         # pick action: either learned policy (with eps-greedy) or rule brain
-        use_learned = random.random() < learn_weight
+        use_learned = self.rng.random() < learn_weight
 
         if use_learned:
             action = self._epsilon_greedy(state)
@@ -622,20 +1423,30 @@ class LearningVillainBrain:
             action = self.rule.decide_action(villain, player)
 
             # occasionally explore near rule decision
-            if random.random() < 0.05:
-                action = random.choice(self.ACTIONS)
+            if self.training and self.rng.random() < 0.05:
+                action = self.rng.choice(self.ACTIONS)
 
         # store last transition context for credit assignment when damage occurs
         self.last_state = state
         self.last_action = action
         return action
 
+    def _record(self, state):
+        if self.last_state is not None:
+            self.replay.push(self.last_state, self.ACTION_INDEX[self.last_action],
+                             self.pending_reward, state)
+            self.pending_reward = 0.0
+        if self.steps % self.replay_every == 0 and len(self.replay) >= self.replay_batch:
+            self.update_batch(*self.replay.sample(self.replay_batch))
+
     def on_damage(self, attacker_is_player, amount, player, villain):
         """
         Call this AFTER damage is applied.
         attacker_is_player: True if player caused damage, False if villain caused damage.
         amount: positive integer damage amount (same as you pass to take_damage)
         """
+        if not self.training:
+            return
         # reward from the AI villain's perspective: positive if villain did damage to player
         if attacker_is_player:
             reward = -amount
@@ -646,14 +1457,15 @@ class LearningVillainBrain:
         if self.last_state is None or self.last_action is None:
             return  # nothing to update
 
-        next_state = self._encode_state(villain, player)
+        if self.replay is not None:
+            # credited to the current transition when the next decision records it
+            self.pending_reward += reward
+            self.epsilon = max(0.02, self.epsilon * 0.9995)
+            return
 
-        s = self.last_state
-        a = self.last_action
+        next_state = self._encode_state(villain, player)
 
-        max_next = max(self.q[next_state].values()) if self.q[next_state] else 0.0
-        td = reward + self.gamma * max_next - self.q[s][a]
-        self.q[s][a] += self.lr * td
+        self.manual_update(self.last_state, self.last_action, reward, next_state)
 
         # slight decay of epsilon over time so learning becomes exploitative
         self.epsilon = max(0.02, self.epsilon * 0.9995)
@@ -662,214 +1474,1010 @@ class LearningVillainBrain:
         self.last_state = None
         self.last_action = None
 
-    # optional: allow external forcing of learning updates (experience replay placeholder)
+    # optional: allow external forcing of learning updates
     def manual_update(self, state, action, reward, next_state):
-        max_next = max(self.q[next_state].values()) if self.q[next_state] else 0.0
-        td = reward + self.gamma * max_next - self.q[state][action]
-        self.q[state][action] += self.lr * td
+        a = self.ACTION_INDEX[action]
+        td = reward + self.gamma * self.q[next_state].max() - self.q[state, a]
+        self.q[state, a] += self.lr * td
+        self.dirty[state] = True
+
+    # --- Batched (vectorized) access: arrays of state indices / action indices ---
+    def greedy_actions(self, states):
+        return self.q[states].argmax(axis=1)
+
+    def update_batch(self, states, actions, rewards, next_states):
+        """
+        TD(0) update for many transitions at once. Repeated (state, action) pairs
+        are averaged, so one batch moves each entry by at most one lr-sized step.
+        """
+        td = rewards + self.gamma * self.q[next_states].max(axis=1) - self.q[states, actions]
+        flat = states * self.q.shape[1] + actions
+        sums = np.bincount(flat, weights=td, minlength=self.q.size)
+        counts = np.bincount(flat, minlength=self.q.size)
+        hit = counts > 0
+        self.q.reshape(-1)[hit] += (self.lr * sums[hit] / counts[hit]).astype(np.float32)
+        self.dirty[states] = True
+
+# --- CLASS: EXPERT BRAIN (anytime Monte Carlo lookahead) ---
+# Copies the live fighters (and projectiles) into a private headless Match and
+# plays each candidate action forward a short horizon against a Hard rule-brain
+# model of the opponent, round after round, until the per-frame time budget is
+# spent. Each rollout adds a sample to its action's mean score: damage dealt
+# minus damage taken, with a slight pull towards striking range. Last frame's
+# choice is rolled out first, so even a cut-short search has an answer.
+class ExpertBrain:
+    GAP_WEIGHT = 0.005  # score per pixel of gap left at the end of a rollout
+
+    def __init__(self, budget_ms=4.0, horizon=20, commit=8, max_rounds=32, seed=None):
+        self.budget = budget_ms / 1000.0
+        self.horizon = horizon
+        self.commit = commit  # frames the candidate is held; the rollout idles after
+        self.max_rounds = max_rounds
+        self.rng = random.Random(seed)
+        self.opponent = VillainBrain("Hard", rng=self.rng)
+        self.sim = None  # created on first use
+        self.last = "IDLE"
+        self.rounds = 0  # rollout rounds completed by the last search
+        self.rollout_cost = 0.0  # slowest recent rollout, seconds (kept between searches)
+
+    def _load(self, me, opponent):
+        """Live state as a Match snapshot for self.sim, and the side `me` plays."""
+        pool = me.projectile_pool
+        if self.sim is None or (self.sim.projectiles is None) != (pool is None):
+            self.sim = Match(multi_shot=pool is not None,
+                             projectile_capacity=pool.capacity if pool is not None else 512)
+        side = 1 if me.is_ai else 0  # Match plays the AI as P2
+        # Fighter state minus animator (the sim is headless); frame from Match.ticks_ms
+        mine, theirs = me.snapshot()[:4] + (None,), opponent.snapshot()[:4] + (None,)
+        frame = -(-me.clock() * FPS // 1000)
+        p1, p2 = (theirs, mine) if side else (mine, theirs)
+        return (frame, False, "", (0, 0), (0, 0), p1, p2,
+                pool.snapshot() if pool is not None else None), side
+
+    def _rollout(self, state, side, action):
+        sim = self.sim
+        sim.restore(state)
+        me, opp = (sim.p2, sim.p1) if side else (sim.p1, sim.p2)
+        model = self.opponent
+        model.action_cooldown, model.state_buffer = 0, "IDLE"
+        my_health, opp_health = me.health, opp.health
+        for f in range(self.horizon):
+            mine = action if f < self.commit else "IDLE"
+            theirs = model.decide_action(opp, me)
+            if side: sim.step(theirs, mine)
+            else: sim.step(mine, theirs)
+            if sim.game_over: break
+        gap = max(0, abs(me.rect.centerx - opp.rect.centerx) - PLAYER_WIDTH)
+        return (opp_health - opp.health) - (my_health - me.health) - self.GAP_WEIGHT * gap
+
+    def decide_action(self, villain, player):
+        deadline = time.perf_counter() + self.budget
+        # Busy: inputs are ignored mid-animation anyway
+        if villain.is_attacking or villain.shoot_anim_frame > 0:
+            return "IDLE"
+
+        state, side = self._load(villain, player)
+        actions = LearningVillainBrain.ACTIONS
+        order = [self.last] + [a for a in actions if a != self.last]
+        totals = dict.fromkeys(actions, 0.0)
+        counts = dict.fromkeys(actions, 0)
+        self.rounds = 0
+        # Slowest recent rollout: don't start one that would overrun, the first included
+        longest = self.rollout_cost
+        while self.rounds < self.max_rounds:
+            for action in order:
+                now = time.perf_counter()
+                if now + longest >= deadline:
+                    break
+                totals[action] += self._rollout(state, side, action)
+                counts[action] += 1
+                longest = max(longest, time.perf_counter() - now)
+            else:
+                self.rounds += 1
+                continue
+            break  # out of time
+        # Decay, so one slow rollout (a GC pause) only shrinks the next few searches
+        self.rollout_cost = longest * 0.9
+
+        self.last = max((a for a in order if counts[a]), key=lambda a: totals[a] / counts[a],
+                        default=self.last)
+        return self.last
+
+# --- CLASS: Q-TABLE STORE (binary, memory-mapped, incremental checkpoints) ---
+# File layout: 64-byte header (magic, version, n_states, n_actions, epsilon, steps)
+# followed by the float32 Q-table, row-major. Only dirty rows are rewritten.
+class QTableStore:
+    MAGIC = b"LTFQ"
+    VERSION = 1
+    HEADER = struct.Struct("<4sIIIdq")
+    HEADER_SIZE = 64
+
+    def __init__(self, path, brain, interval=5.0):
+        self.path = path
+        self.brain = brain
+        self.interval = interval
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+        shape = brain.q.shape
+        if not os.path.exists(path):
+            with open(path, "wb") as f:
+                f.truncate(self.HEADER_SIZE + brain.q.nbytes)
+            self.mm = self._map(shape)
+            self.mm[:] = brain.q
+            self.mm.flush()
+            self._write_header()
+        else:
+            self._check_header(shape)
+            self.mm = self._map(shape)
+            brain.q[:] = self.mm
+            brain.dirty[:] = False
+
+    def _map(self, shape):
+        return np.memmap(self.path, dtype=np.float32, mode="r+",
+                         offset=self.HEADER_SIZE, shape=shape)
+
+    @classmethod
+    def _read_header(cls, path, shape):
+        # Every way a file can be unusable is a ValueError, so callers catch one thing
+        with open(path, "rb") as f:
+            header = f.read(cls.HEADER.size)
+        if len(header) < cls.HEADER.size:
+            raise ValueError(f"{path} is not a Q-table file (v{cls.VERSION})")
+        magic, version, n_states, n_actions, epsilon, steps = cls.HEADER.unpack(header)
+        if magic != cls.MAGIC or version != cls.VERSION:
+            raise ValueError(f"{path} is not a Q-table file (v{cls.VERSION})")
+        if (n_states, n_actions) != shape:
+            raise ValueError(f"{path} holds a {n_states}x{n_actions} table, brain needs {shape[0]}x{shape[1]}")
+        if os.path.getsize(path) < cls.HEADER_SIZE + n_states * n_actions * 4:
+            raise ValueError(f"{path} is truncated")
+        return epsilon, steps
+
+    def _check_header(self, shape):
+        self.brain.epsilon, self.brain.steps = self._read_header(self.path, shape)
+
+    @classmethod
+    def load(cls, path, brain):
+        """Copy a saved table into brain without mapping the file for writing. Returns brain."""
+        brain.epsilon, brain.steps = cls._read_header(path, brain.q.shape)
+        q = np.fromfile(path, dtype=np.float32, offset=cls.HEADER_SIZE, count=brain.q.size)
+        brain.q[:] = q.reshape(brain.q.shape)
+        brain.dirty[:] = False
+        return brain
+
+    def _write_header(self):
+        header = self.HEADER.pack(self.MAGIC, self.VERSION, *self.brain.q.shape,
+                                  self.brain.epsilon, self.brain.steps)
+        with open(self.path, "r+b") as f:
+            f.write(header)
+
+    def checkpoint(self):
+        """Copy dirty rows into the mapped file and flush. Returns rows written."""
+        with self._lock:
+            brain = self.brain
+            rows = np.flatnonzero(brain.dirty)
+            # Clear before copying: a row updated mid-copy is simply marked again
+            brain.dirty[rows] = False
+            if len(rows):
+                self.mm[rows] = brain.q[rows]
+                self.mm.flush()
+            self._write_header()
+            return len(rows)
+
+    def start(self):
+        """Checkpoint every `interval` seconds on a daemon thread (the game loop never waits on disk)."""
+        self._thread = threading.Thread(target=self._run, name="qtable-checkpoint", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.checkpoint()
+
+    def close(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self.checkpoint()
+        del self.mm
+
+# --- MATCH TELEMETRY (append-only binary event log) ---
+# A 12-byte header, then fixed 9-byte records (TELEMETRY_DTYPE), one per event:
+#   EV_MATCH_START  value = match number in this log
+#   EV_INPUT        side's input changed; value = encode_input() byte (key mask,
+#                   or RECORD_BRAIN_BIT | action index for a brain)
+#   EV_HIT / EV_BLOCK  side = defender, detail = SRC_*, value = damage (taken / blocked)
+#   EV_SHIELD_BREAK, EV_SHOT, EV_SHOT_MISSED (left the screen)  side = who
+#   EV_KO           side = winner
+EV_MATCH_START, EV_INPUT, EV_HIT, EV_BLOCK, EV_SHIELD_BREAK, EV_SHOT, EV_SHOT_MISSED, EV_KO = range(8)
+SRC_PUNCH, SRC_KICK, SRC_PROJECTILE = range(3)
+TELEMETRY_DTYPE = np.dtype([("frame", "<u4"), ("kind", "u1"), ("side", "u1"),
+                            ("detail", "u1"), ("value", "<i2")])
+
+class TelemetryLog:
+    """
+    emit() fills an in-memory block of records; full blocks are handed to a
+    background thread that appends them to the file, so the game loop never
+    waits on disk. Written blocks are recycled rather than reallocated.
+    """
+    MAGIC = b"LTFT"
+    VERSION = 1
+    HEADER = struct.Struct("<4sII")  # magic, version, record size
+
+    def __init__(self, path, block_size=4096):
+        self.path = path
+        if os.path.exists(path) and os.path.getsize(path):
+            with open(path, "rb") as f:
+                self._check_header(path, f.read(self.HEADER.size))
+            self.file = open(path, "ab")
+        else:
+            self.file = open(path, "wb")
+            self.file.write(self.HEADER.pack(self.MAGIC, self.VERSION, TELEMETRY_DTYPE.itemsize))
+        self.block = np.zeros(block_size, dtype=TELEMETRY_DTYPE)
+        self.n = 0
+        self.matches = 0
+        self._full = queue.SimpleQueue()   # (block, count) to write; None stops the writer
+        self._spare = queue.SimpleQueue()  # written blocks, ready for reuse
+        self._thread = threading.Thread(target=self._run, name="telemetry-writer", daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def _check_header(cls, path, data):
+        if len(data) < cls.HEADER.size:
+            raise ValueError(f"{path} is not a telemetry log (v{cls.VERSION})")
+        magic, version, size = cls.HEADER.unpack(data)
+        if magic != cls.MAGIC or version != cls.VERSION or size != TELEMETRY_DTYPE.itemsize:
+            raise ValueError(f"{path} is not a telemetry log (v{cls.VERSION})")
+
+    def emit(self, frame, kind, side, detail=0, value=0):
+        self.block[self.n] = (frame, kind, side, detail, value)
+        self.n += 1
+        if self.n == len(self.block):
+            self.flush()
+
+    def flush(self):
+        """Hand buffered events to the writer thread (does not wait for the write)."""
+        if not self.n:
+            return
+        self._full.put((self.block, self.n))
+        try:
+            self.block = self._spare.get_nowait()
+        except queue.Empty:
+            self.block = np.zeros_like(self.block)
+        self.n = 0
+
+    def _run(self):
+        while True:
+            item = self._full.get()
+            if item is None:
+                return
+            block, n = item
+            self.file.write(block[:n].tobytes())
+            self.file.flush()
+            self._spare.put(block)
+
+    def close(self):
+        self.flush()
+        self._full.put(None)
+        self._thread.join()
+        self.file.close()
+
+def load_telemetry(path):
+    """Every event in a log as one NumPy record array (columns: events["frame"], ...)."""
+    with open(path, "rb") as f:
+        TelemetryLog._check_header(path, f.read(TelemetryLog.HEADER.size))
+    # Whole records only: a write cut short by a crash leaves a partial one at the end
+    count = (os.path.getsize(path) - TelemetryLog.HEADER.size) // TELEMETRY_DTYPE.itemsize
+    return np.fromfile(path, dtype=TELEMETRY_DTYPE, count=count, offset=TelemetryLog.HEADER.size)
+
+def apply_action(fighter, enemy, action):
+    """One brain action string for fighter, which then turns to face enemy. Returns True if it fired a shot."""
+    fighter.toggle_shield(False) # Reset
+
+    shot = False
+    if action == "LEFT": 
+        fighter.move(-SPEED, 0)
+        fighter.direction = -1
+    elif action == "RIGHT": 
+        fighter.move(SPEED, 0)
+        fighter.direction = 1
+    elif action == "JUMP": fighter.jump()
+    elif action == "PUNCH": fighter.attack("punch")
+    elif action == "KICK": fighter.attack("kick")
+    elif action == "SHIELD": fighter.toggle_shield(True)
+    elif action == "SHOOT": shot = fighter.shoot()
+
+    # Always face enemy
+    if enemy.rect.centerx < fighter.rect.centerx: fighter.direction = -1
+    else: fighter.direction = 1
+    return shot
+
+# --- CLASS: MATCH (Headless Simulation Core) ---
+# One frame of match logic with no window, clock or keyboard attached.
+# Each side is driven by either an INPUT_* bitmask (human style: several keys
+# held at once) or a single action string from a brain (AI style).
+class Match:
+    P1_START_X = 200
+    P2_START_X = 600
+
+    def __init__(self, headless=True, multi_shot=False, projectile_capacity=512):
+        self.frame = 0
+        self.p1 = Fighter(self.P1_START_X, FLOOR_Y - PLAYER_HEIGHT, BLUE,
+                          headless=headless, clock=self.ticks_ms)
+        self.p2 = Fighter(self.P2_START_X, FLOOR_Y - PLAYER_HEIGHT, RED, is_ai=True,
+                          headless=headless, clock=self.ticks_ms)
+        self.p2.direction = -1
+
+        # Multi-shot mode: both fighters fire into one shared projectile pool
+        self.multi_shot = multi_shot
+        self.projectiles = ProjectilePool(projectile_capacity) if multi_shot else None
+        if multi_shot:
+            for owner, f in enumerate((self.p1, self.p2)):
+                f.projectile_pool = self.projectiles
+                f.pool_owner = owner
+        self.game_over = False
+        self.winner = ""
+        self.damage_dealt = [0, 0]  # [by p1, by p2]
+        self.frame_damage = [0, 0]  # same, for the last step only
+        self.frame_actions = [None, None]  # inputs the last step applied, per side
+        self.profiler = None  # optional FrameProfiler, marks sim phases
+        self.telemetry = None  # optional TelemetryLog, gets this match's events
+        self.logged_inputs = [None, None]  # last input byte logged per side
+
+    def ticks_ms(self):
+        # Sim clock: what pygame.time.get_ticks() would read at a locked FPS
+        return self.frame * 1000 // FPS
+
+    @staticmethod
+    def _holds(action, direction):
+        if isinstance(action, str):
+            return action == direction
+        bit = INPUT_LEFT if direction == "LEFT" else INPUT_RIGHT
+        return bool(action & bit)
+
+    def _apply_keys(self, fighter, mask):
+        if mask & INPUT_LEFT:
+            fighter.move(-SPEED, 0)
+            fighter.direction = -1
+        if mask & INPUT_RIGHT:
+            fighter.move(SPEED, 0)
+            fighter.direction = 1
+        if mask & INPUT_JUMP: fighter.jump()
+        if mask & INPUT_PUNCH: fighter.attack("punch")
+        if mask & INPUT_KICK: fighter.attack("kick")
+        if mask & INPUT_SHOOT and fighter.shoot(): self._log_shot(fighter)
+        fighter.toggle_shield(bool(mask & INPUT_SHIELD))
+
+    def _apply(self, fighter, enemy, action):
+        if isinstance(action, str):
+            if apply_action(fighter, enemy, action): self._log_shot(fighter)
+        else:
+            self._apply_keys(fighter, action)
+
+    def _resolve_collision(self, p1_action, p2_action):
+        player, villain = self.p1, self.p2
+        # --- COLLISION RESOLUTION (HARD STOP) ---
+        if not player.rect.colliderect(villain.rect):
+            return
+
+        # 1. Vertical Check (Cross-Up Logic)
+        # "it can continue after player b body ends" -> If jumping over, ignore collision
+        # Check if one is significantly above the other (e.g. jumping)
+        player_is_above = player.rect.bottom < villain.rect.centery + 20
+        villain_is_above = villain.rect.bottom < player.rect.centery + 20
+
+        # Only apply "Wall" physics if they are on the same level
+        if player_is_above or villain_is_above:
+            return
+
+        # 2. Determine Relative Position
+        if player.rect.centerx < villain.rect.centerx:
+            # CASE A: Player is on the LEFT, Villain on RIGHT
+            if self._holds(p1_action, "RIGHT"):
+                player.rect.right = villain.rect.left # Hard Stop
+            elif self._holds(p2_action, "LEFT"):
+                villain.rect.left = player.rect.right # Hard Stop
+            else:
+                # If they spawned inside each other (glitch prevention)
+                mid = (player.rect.centerx + villain.rect.centerx) / 2
+                player.rect.right = mid
+                villain.rect.left = mid
+        else:
+            # CASE B: Player is on the RIGHT, Villain on LEFT
+            if self._holds(p1_action, "LEFT"):
+                player.rect.left = villain.rect.right # Hard Stop ("Run ends here")
+            elif self._holds(p2_action, "RIGHT"):
+                villain.rect.right = player.rect.left # Hard Stop
+            else:
+                # Glitch prevention
+                mid = (player.rect.centerx + villain.rect.centerx) / 2
+                player.rect.left = mid
+                villain.rect.right = mid
+
+    def _log_shot(self, fighter):
+        if self.telemetry: self.telemetry.emit(self.frame, EV_SHOT, fighter is self.p2)
+
+    def _log_input(self, side, action):
+        # Before a side's input is applied: match start and input changes
+        tel = self.telemetry
+        if self.frame == 0 and side == 0:
+            tel.matches += 1
+            tel.emit(0, EV_MATCH_START, 0, 0, tel.matches)
+        byte = encode_input(action)
+        if byte != self.logged_inputs[side]:
+            self.logged_inputs[side] = byte
+            tel.emit(self.frame, EV_INPUT, side, 0, byte)
+
+    def _hit(self, attacker, defender, idx, amount, source):
+        if defender.take_damage(amount):
+            self.damage_dealt[idx] += amount
+            self.frame_damage[idx] += amount
+            if self.telemetry: self.telemetry.emit(self.frame, EV_HIT, 1 - idx, source, amount)
+        elif self.telemetry:
+            self.telemetry.emit(self.frame, EV_BLOCK, 1 - idx, source, amount)
+
+    def step(self, p1_action, p2_action):
+        """
+        Advance the match by one frame. Returns True once the match is over.
+        p2_action may also be a brain's decide_action: it is then called after
+        P1's input is applied, so the brain sees this frame's press (as in the
+        original game loop). The action it picked is left in frame_actions[1].
+        """
+        if self.game_over:
+            return True
+        player, villain = self.p1, self.p2
+        self.frame_damage[0] = self.frame_damage[1] = 0
+        prof = self.profiler
+        player.save_prev()
+        villain.save_prev()
+        tel = self.telemetry
+        if tel:
+            # Watched across the step: shield breaks, and shots leaving the screen
+            cooldowns = (player.shield_cooldown, villain.shield_cooldown)
+            in_flight = [f.projectile is not None and f.projectile.active for f in (player, villain)]
+
+        # --- INPUT ---
+        if tel: self._log_input(0, p1_action)
+        self._apply(player, villain, p1_action)
+        if callable(p2_action):
+            if prof: prof.mark("input")
+            p2_action = p2_action(villain, player)
+            if prof: prof.mark("brain")
+        if tel: self._log_input(1, p2_action)
+        self._apply(villain, player, p2_action)
+        self.frame_actions[0], self.frame_actions[1] = p1_action, p2_action
+        if prof: prof.mark("input")
+
+        # --- PHYSICS ---
+        p_hitbox = player.update()
+        v_hitbox = villain.update()
+        if self.projectiles:
+            culled = self.projectiles.update()
+            if tel:
+                for owner in self.projectiles.owner[culled]: tel.emit(self.frame, EV_SHOT_MISSED, owner)
+        if tel:
+            for side, f in enumerate((player, villain)):
+                if in_flight[side] and f.projectile is None: tel.emit(self.frame, EV_SHOT_MISSED, side)
+                if f.shield_cooldown and not cooldowns[side]: tel.emit(self.frame, EV_SHIELD_BREAK, side)
+        if prof: prof.mark("update")
+        self._resolve_collision(p1_action, p2_action)
+
+        # --- COMBAT ---
+        if p_hitbox and p_hitbox.colliderect(villain.rect) and not player.has_hit:
+            player.has_hit = True
+            punch = player.attack_type == "punch"
+            self._hit(player, villain, 0, 8 if punch else 5, SRC_PUNCH if punch else SRC_KICK)
+
+        if v_hitbox and v_hitbox.colliderect(player.rect) and not villain.has_hit:
+            villain.has_hit = True
+            punch = villain.attack_type == "punch"
+            self._hit(villain, player, 1, 8 if punch else 5, SRC_PUNCH if punch else SRC_KICK)
+
+        # Projectiles
+        if player.projectile and player.projectile.rect.colliderect(villain.rect):
+            player.projectile.active = False
+            self._hit(player, villain, 0, SHOOT_DAMAGE, SRC_PROJECTILE)
+
+        if villain.projectile and villain.projectile.rect.colliderect(player.rect):
+            villain.projectile.active = False
+            self._hit(villain, player, 1, SHOOT_DAMAGE, SRC_PROJECTILE)
+
+        if self.projectiles:
+            p_hits, v_hits = self.projectiles.collide((player.rect, villain.rect))
+            for _ in range(p_hits): self._hit(villain, player, 1, SHOOT_DAMAGE, SRC_PROJECTILE)
+            for _ in range(v_hits): self._hit(player, villain, 0, SHOOT_DAMAGE, SRC_PROJECTILE)
+
+        if prof: prof.mark("combat")
+
+        # Game Over
+        if player.health <= 0:
+            self.winner = "VILLAIN WINS"
+            self.game_over = True
+        elif villain.health <= 0:
+            self.winner = "PLAYER WINS"
+            self.game_over = True
+        if tel and self.game_over:
+            tel.emit(self.frame, EV_KO, self.winner == "VILLAIN WINS")
+            tel.flush()
+
+        self.frame += 1
+        return self.game_over
+
+    def snapshot(self):
+        """Everything step() reads or writes, as cheap-to-copy tuples (rollback, see netplay.py)."""
+        return (self.frame, self.game_over, self.winner, tuple(self.damage_dealt),
+                tuple(self.frame_damage), self.p1.snapshot(), self.p2.snapshot(),
+                self.projectiles.snapshot() if self.projectiles is not None else None)
+
+    def restore(self, state):
+        self.frame, self.game_over, self.winner, dealt, frame_dmg, p1, p2, pool = state
+        self.damage_dealt = list(dealt)
+        self.frame_damage = list(frame_dmg)
+        self.p1.restore(p1)
+        self.p2.restore(p2)
+        if pool is not None: self.projectiles.restore(pool)
+
+def run_headless(brain1, brain2, max_frames=FPS * 99):
+    """Play brain1 (P1) against brain2 (P2) with no window, as fast as possible."""
+    match = Match()
+    while not match.game_over and match.frame < max_frames:
+        a1 = brain1.decide_action(match.p1, match.p2)
+        a2 = brain2.decide_action(match.p2, match.p1)
+        match.step(a1, a2)
+    return match
+
+# --- MATCH RECORDING / REPLAY ---
+# A recording is a 16-byte header (magic, version, mode, seed) followed by two bytes
+# per frame, one per side: an INPUT_* key mask, or RECORD_BRAIN_BIT | action index
+# for a brain-driven side. Match.step() is deterministic given its inputs, so
+# re-simulating those bytes reproduces the match exactly.
+RECORD_MAGIC = b"LTFR"
+RECORD_VERSION = 1
+RECORD_HEADER = struct.Struct("<4sHBxq")  # magic, version, mode flags, seed
+RECORD_MULTI_SHOT = 1
+RECORD_BRAIN_BIT = 0x80
+NO_SEED = -1
+
+def encode_input(action):
+    if isinstance(action, str):
+        return RECORD_BRAIN_BIT | LearningVillainBrain.ACTION_INDEX[action]
+    return action
+
+def decode_input(byte):
+    if byte & RECORD_BRAIN_BIT:
+        return LearningVillainBrain.ACTIONS[byte & ~RECORD_BRAIN_BIT]
+    return byte
+
+Recording = namedtuple("Recording", "seed multi_shot inputs")
+
+class MatchRecorder:
+    def __init__(self, seed=None, multi_shot=False):
+        self.seed = seed
+        self.multi_shot = multi_shot
+        self.frames = bytearray()
+
+    def record(self, p1_action, p2_action):
+        self.frames.append(encode_input(p1_action))
+        self.frames.append(encode_input(p2_action))
+
+    def save(self, path):
+        seed = NO_SEED if self.seed is None else self.seed
+        with open(path, "wb") as f:
+            mode = RECORD_MULTI_SHOT if self.multi_shot else 0
+            f.write(RECORD_HEADER.pack(RECORD_MAGIC, RECORD_VERSION, mode, seed))
+            f.write(self.frames)
+
+def load_recording(path):
+    """Returns a Recording: seed (or None), multi_shot, [(p1_action, p2_action), ...]."""
+    with open(path, "rb") as f:
+        data = f.read()
+    magic, version, mode, seed = RECORD_HEADER.unpack_from(data)
+    if magic != RECORD_MAGIC or version != RECORD_VERSION:
+        raise ValueError(f"{path} is not a match recording (v{RECORD_VERSION})")
+    body = data[RECORD_HEADER.size:]
+    inputs = [(decode_input(body[i]), decode_input(body[i + 1])) for i in range(0, len(body) - 1, 2)]
+    return Recording(None if seed == NO_SEED else seed, bool(mode & RECORD_MULTI_SHOT), inputs)
+
+def replay_match(path, render=False):
+    """
+    Re-simulate a recording. Headless runs as fast as the CPU allows;
+    render=True opens the window and plays it back at FPS.
+    """
+    rec = load_recording(path)
+    if render:
+        init_display()
+        bg = load_background()
+    match = Match(headless=not render, multi_shot=rec.multi_shot)
+    for p1_action, p2_action in rec.inputs:
+        match.step(p1_action, p2_action)
+        if render:
+            clock.tick(FPS)
+            pygame.event.pump()
+            draw_match(screen, bg, match)
+            pygame.display.flip()
+    return match
+
+# --- DRAWING ---
+def load_background():
+    return _decode_background().convert()
+
+@lru_cache(maxsize=1)
+def game_over_overlay():
+    overlay = pygame.Surface((WIDTH, HEIGHT))
+    overlay.set_alpha(150)
+    overlay.fill(BLACK)
+    return overlay
+
+def draw_match(surface, bg, match, profiler=None, alpha=1.0, erase=None):
+    """
+    alpha: how far between the last two sim ticks to draw moving objects (0..1).
+    erase: restore only these rects from bg, not the whole background (dirty-rect mode).
+    Returns the rects drawn over the background.
+    """
+    player, villain = match.p1, match.p2
+    # Background Floor
+    if erase is None:
+        surface.blit(bg, (0, 0))
+    else:
+        for r in erase:
+            surface.blit(bg, r, r)
+    if profiler: profiler.mark("bg")
+
+    drawn = player.draw(surface, alpha) + villain.draw(surface, alpha)
+    if match.projectiles: drawn += match.projectiles.draw(surface, alpha)
+    if profiler: profiler.mark("fighters")
+    
+    # HUD
+    drawn.append(draw_text(f"P1: {int(player.health)}", 20, WHITE, 100, 30, surface=surface))
+    drawn.append(draw_text(f"CPU: {int(villain.health)}", 20, WHITE, WIDTH-100, 30, surface=surface))
+    
+    if match.game_over:
+        winner = match.winner
+        surface.blit(game_over_overlay(), (0,0))
+        draw_text(winner, 60, GREEN if winner == "PLAYER WINS" else RED, WIDTH//2, HEIGHT//2, surface=surface)
+        draw_text("Press R to Restart", 30, WHITE, WIDTH//2, HEIGHT//2 + 50, surface=surface)
+        drawn.append(surface.get_rect())
+    if profiler: profiler.mark("hud")
+    return drawn
+
+# --- FRAME PROFILER (opt-in: --profile) ---
+# Times each phase of a frame with perf_counter_ns. mark(phase) charges the time
+# since the previous mark to that phase, so phases can be hit more than once.
+class FrameProfiler:
+    PHASES = ("input", "brain", "update", "combat", "bg", "fighters", "hud", "flip")
+    REFRESH = 30  # frames between overlay text updates (keeps the text cache warm)
+    ZEROS = (0,) * len(PHASES)
+
+    def __init__(self, window=240, csv_path=None):
+        self.index = {p: i for i, p in enumerate(self.PHASES)}
+        self.samples = np.zeros((window, len(self.PHASES)), dtype=np.int64)
+        self.pos = 0
+        self.count = 0
+        self.current = [0] * len(self.PHASES)
+        self.last = 0
+        self.frame = 0
+        self.lines = []
+        self.csv_file = None
+        if csv_path:
+            self.csv_file = open(csv_path, "w", newline="")
+            self.csv = csv.writer(self.csv_file)
+            self.csv.writerow(["frame", *(f"{p}_ns" for p in self.PHASES), "total_ns"])
+
+    def begin_frame(self):
+        self.current[:] = self.ZEROS
+        self.last = time.perf_counter_ns()
+
+    def mark(self, phase):
+        now = time.perf_counter_ns()
+        self.current[self.index[phase]] += now - self.last
+        self.last = now
+
+    def end_frame(self):
+        self.samples[self.pos] = self.current
+        self.pos = (self.pos + 1) % len(self.samples)
+        self.count = min(self.count + 1, len(self.samples))
+        if self.csv_file:
+            self.csv.writerow([self.frame, *self.current, sum(self.current)])
+        if self.frame % self.REFRESH == 0:
+            self._refresh_lines()
+        self.frame += 1
+
+    def percentiles(self):
+        """(p50, p99) in ms for each phase plus the frame total, over the rolling window."""
+        window = self.samples[:self.count]
+        totals = window.sum(axis=1, keepdims=True)
+        p50, p99 = np.percentile(np.hstack([window, totals]), [50, 99], axis=0) / 1e6
+        return dict(zip(self.PHASES + ("total",), zip(p50, p99)))
+
+    def _refresh_lines(self):
+        self.lines = [f"{'phase':<9}{'p50':>7}{'p99':>7}  ms"]
+        for phase, (p50, p99) in self.percentiles().items():
+            self.lines.append(f"{phase:<9}{p50:>7.2f}{p99:>7.2f}")
+
+    def draw(self, surface):
+        panel = pygame.Rect(WIDTH - 230, 90, 220, 18 * len(self.lines) + 10)
+        pygame.draw.rect(surface, BLACK, panel)
+        for i, line in enumerate(self.lines):
+            draw_text(line, 14, YELLOW, panel.x + 8, panel.y + 5 + 18 * i, align="left", surface=surface)
+        return panel
+
+    def close(self):
+        if self.csv_file:
+            self.csv_file.close()
+            self.csv_file = None
+
+# --- ALLOCATION TRACKER (opt-in: --trace-alloc) ---
+# Steady-state frames should allocate nothing that outlives them. Every
+# `interval` frames this diffs two tracemalloc snapshots and prints what those
+# frames allocated and kept, by call site, with the per-frame peak of
+# short-lived allocations and the garbage collections (and GC time) seen.
+class AllocationTracker:
+    def __init__(self, interval=120, top=8):
+        self.interval = interval
+        self.top = top
+        self.frame = 0
+        self.frame_start = 0
+        self.peak = 0        # largest transient allocation within one frame, bytes
+        self.collections = 0
+        self.gc_ns = 0
+        self.gc_start = 0
+        # Keep the tracker's own bookkeeping out of the report
+        self.filters = [tracemalloc.Filter(False, tracemalloc.__file__),
+                        tracemalloc.Filter(False, "<frozen importlib._bootstrap>")]
+        tracemalloc.start()
+        self.baseline = tracemalloc.take_snapshot().filter_traces(self.filters)
+        gc.callbacks.append(self._on_gc)
+
+    def _on_gc(self, phase, info):
+        if phase == "start":
+            self.gc_start = time.perf_counter_ns()
+        else:
+            self.collections += 1
+            self.gc_ns += time.perf_counter_ns() - self.gc_start
+
+    def begin_frame(self):
+        tracemalloc.reset_peak()
+        self.frame_start = tracemalloc.get_traced_memory()[0]
+
+    def end_frame(self):
+        self.peak = max(self.peak, tracemalloc.get_traced_memory()[1] - self.frame_start)
+        self.frame += 1
+        if self.frame % self.interval == 0:
+            self.report()
+
+    def report(self):
+        snapshot = tracemalloc.take_snapshot().filter_traces(self.filters)
+        stats = [s for s in snapshot.compare_to(self.baseline, "lineno") if s.size_diff > 0]
+        self.baseline = snapshot
+        n = self.interval
+        kept = sum(s.size_diff for s in stats)
+        print(f"[alloc] frames {self.frame - n}-{self.frame - 1}: kept {kept / n:.0f} B/frame, "
+              f"peak transient {self.peak} B, {self.collections} GCs ({self.gc_ns / 1e6:.2f} ms)")
+        for s in stats[:self.top]:
+            frame = s.traceback[0]
+            print(f"[alloc]   {frame.filename}:{frame.lineno}  +{s.size_diff / n:.0f} B/frame "
+                  f"+{s.count_diff / n:.2f} blocks/frame")
+        self.peak = self.collections = self.gc_ns = 0
+
+    def close(self):
+        gc.callbacks.remove(self._on_gc)
+        tracemalloc.stop()
+
+BRAIN_FILE = "ai_brain.qtab"
 
 # --- MAIN GAME LOOP ---
-def main():
+def main(seed=None, record_dir=None, profile=False, profile_csv=None, multi_shot=False,
+         render_fps=RENDER_FPS, dirty_rects=False, trace_alloc=0, telemetry_path=None):
+    """
+    telemetry_path: append every match's events (inputs, hits, blocks, shots...) to this log.
+    trace_alloc: print allocations by call site every this many frames (0 = off).
+    render_fps: draw-rate cap (0 = uncapped); the simulation always ticks at FPS.
+    dirty_rects: repaint and present only the screen areas that changed.
+    multi_shot: unlimited projectiles from a shared pool instead of one shot each.
+    seed: make the AI deterministic (each match reseeds from it).
+    record_dir: save every match's inputs there as match_NNNN.ltfr.
+    profile: show per-phase frame timings; profile_csv also dumps every frame.
+    """
+    init_display()
     running = True
     in_menu = True
-    game_over = False
     
-    player = Fighter(200, FLOOR_Y - PLAYER_HEIGHT, BLUE)
-    villain = Fighter(600, FLOOR_Y - PLAYER_HEIGHT, RED, is_ai=True)
-    bg = pygame.image.load("assets/background.png").convert()
-    bg = pygame.transform.scale(bg, (WIDTH, HEIGHT))
-
-    villain.direction = -1
+    profiler = FrameProfiler(csv_path=profile_csv) if profile else None
+    tracker = None
+    telemetry = TelemetryLog(telemetry_path) if telemetry_path else None
+    # Sprites decode in the background; the match is built once they are in
+    loader = AssetLoader()
+    match = None
+    bg = None
+
+    # Recording
+    recorder = MatchRecorder(seed, multi_shot) if record_dir else None
+    saved_matches = 0
+    if record_dir:
+        os.makedirs(record_dir, exist_ok=True)
+
+    def new_rng():
+        return None if seed is None else random.Random(seed)
+
+    def save_recording():
+        nonlocal saved_matches
+        if recorder and recorder.frames:
+            saved_matches += 1
+            recorder.save(os.path.join(record_dir, f"match_{saved_matches:04d}.ltfr"))
+            recorder.frames.clear()
 
     brain = None
+    store = None  # QTableStore for the learning brain, if selected
+    menu_error = ""  # shown under the options, e.g. why the learning brain can't load
     difficulty_selected = ""
-    winner = ""
+    accumulator = 0.0  # real time not yet simulated, in seconds
+    last_drawn = None  # dirty-rect mode: rects drawn last frame (None = repaint everything)
 
     while running:
-        clock.tick(FPS)
-        screen.fill(BLACK)
+        # Fixed timestep: render as often as render_fps allows, and run however
+        # many SIM_DT ticks the elapsed real time calls for
+        accumulator = min(accumulator + clock.tick(render_fps) / 1000.0, MAX_FRAME_TIME)
+        if profiler: profiler.begin_frame()
+        if tracker: tracker.begin_frame()
         
         # --- EVENT HANDLING ---
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 running = False
             
-            if in_menu and event.type == pygame.KEYDOWN:
+            if in_menu and event.type == pygame.KEYDOWN and match:
                 if event.key == pygame.K_1:
                     difficulty_selected = "Easy"
-                    brain = VillainBrain("Easy")
+                    brain = VillainBrain("Easy", rng=new_rng())
                     in_menu = False
                 elif event.key == pygame.K_2:
                     difficulty_selected = "Medium"
-                    brain = VillainBrain("Medium")
+                    brain = VillainBrain("Medium", rng=new_rng())
                     in_menu = False
                 elif event.key == pygame.K_3:
                     difficulty_selected = "Hard"
-                    brain = VillainBrain("Hard")
+                    brain = VillainBrain("Hard", rng=new_rng())
+                    in_menu = False
+                elif event.key == pygame.K_4:
+                    if store is None:
+                        # Resume from (and keep saving to) the brain file
+                        try:
+                            store = QTableStore(BRAIN_FILE, LearningVillainBrain("Hard", seed=seed)).start()
+                        except ValueError as e:
+                            # Never overwrite it: the player decides what to do with the file
+                            menu_error = f"{e}: move it away to start a new brain"
+                            continue
+                    difficulty_selected = "Learning"
+                    brain = store.brain
+                    menu_error = ""
+                    in_menu = False
+                elif event.key == pygame.K_5:
+                    difficulty_selected = "Adaptive"
+                    brain = AdaptiveVillainBrain(rng=new_rng())
+                    in_menu = False
+                elif event.key == pygame.K_6:
+                    difficulty_selected = "Expert"
+                    brain = ExpertBrain(seed=seed)
                     in_menu = False
             
-            elif game_over and event.type == pygame.KEYDOWN:
+            elif not in_menu and match.game_over and event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_r:
                     # Reset
-                    player = Fighter(200, FLOOR_Y - PLAYER_HEIGHT, BLUE)
-                    villain = Fighter(600, FLOOR_Y - PLAYER_HEIGHT, RED, is_ai=True)
-                    villain.direction = -1
-                    game_over = False
-                    winner = ""
+                    match = Match(headless=False, multi_shot=multi_shot)
+                    match.profiler = profiler
+                    match.telemetry = telemetry
+                    if seed is not None:
+                        brain.rng.seed(seed)
+                    accumulator = 0.0  # the rematch starts on its own clock
                 if event.key == pygame.K_m:
                     in_menu = True
 
+        if loader and loader.poll():
+            bg = loader.background
+            match = Match(headless=False, multi_shot=multi_shot)
+            match.profiler = profiler
+            match.telemetry = telemetry
+            loader = None
+            # Start tracing once startup's one-off allocations are done
+            if trace_alloc: tracker = AllocationTracker(trace_alloc)
+
         if in_menu:
+            last_drawn = None
+            screen.fill(BLACK)
             draw_text("STREET FIGHTER ENGINE", 60, WHITE, WIDTH//2, 100)
+            if loader:
+                # Loading bar until the difficulty options can be picked
+                draw_text("LOADING...", 30, WHITE, WIDTH//2, 300)
+                pygame.draw.rect(screen, GRAY, (WIDTH//2 - 200, 330, 400, 20))
+                pygame.draw.rect(screen, WHITE, (WIDTH//2 - 200, 330, 400 * loader.progress, 20))
+                pygame.display.flip()
+                continue
             draw_text("1. EASY", 30, GREEN, WIDTH//2, 250)
             draw_text("2. MEDIUM", 30, YELLOW, WIDTH//2, 300)
             draw_text("3. HARD", 30, RED, WIDTH//2, 350)
+            draw_text("4. LEARNING", 30, ORANGE, WIDTH//2, 400)
+            draw_text("5. ADAPTIVE", 30, WHITE, WIDTH//2, 450)
+            draw_text("6. EXPERT", 30, BLUE, WIDTH//2, 500)
+            if menu_error:
+                draw_text(menu_error, 24, RED, WIDTH//2, 580)
             pygame.display.flip()
+            accumulator = 0.0
             continue
 
-        if not game_over:
-            # --- INPUT ---
-            keys = pygame.key.get_pressed()
-            if keys[pygame.K_LEFT]: 
-                player.move(-SPEED, 0)
-                player.direction = -1
-            if keys[pygame.K_RIGHT]: 
-                player.move(SPEED, 0)
-                player.direction = 1
-            if keys[pygame.K_UP]: player.jump()
-            if keys[pygame.K_a]: player.attack("punch")
-            if keys[pygame.K_d]: player.attack("kick")
-            if keys[pygame.K_s]: player.shoot()
-            player.toggle_shield(keys[pygame.K_w])
-
-            # --- AI BRAIN ---
-            action = brain.decide_action(villain, player)
-            villain.toggle_shield(False) # Reset
-
-            if action == "LEFT": 
-                villain.move(-SPEED, 0)
-                villain.direction = -1
-            elif action == "RIGHT": 
-                villain.move(SPEED, 0)
-                villain.direction = 1
-            elif action == "JUMP": villain.jump()
-            elif action == "PUNCH": villain.attack("punch")
-            elif action == "KICK": villain.attack("kick")
-            elif action == "SHIELD": villain.toggle_shield(True)
-            elif action == "SHOOT": villain.shoot()
-
-            # Always face enemy
-            if player.rect.centerx < villain.rect.centerx: villain.direction = -1
-            else: villain.direction = 1
-
-            # --- PHYSICS ---
-            p_hitbox = player.update()
-            v_hitbox = villain.update()
-
-            # --- COLLISION RESOLUTION (FIXED) ---
-            # --- COLLISION RESOLUTION (HARD STOP) ---
-            if player.rect.colliderect(villain.rect):
-                # 1. Vertical Check (Cross-Up Logic)
-                # "it can continue after player b body ends" -> If jumping over, ignore collision
-                p_bottom = player.rect.bottom
-                v_bottom = villain.rect.bottom
-                
-                # Check if one is significantly above the other (e.g. jumping)
-                player_is_above = p_bottom < villain.rect.centery + 20
-                villain_is_above = v_bottom < player.rect.centery + 20
-
-                # Only apply "Wall" physics if they are on the same level
-                if not player_is_above and not villain_is_above:
-                    
-                    # 2. Determine Relative Position
-                    if player.rect.centerx < villain.rect.centerx:
-                        # CASE A: Player is on the LEFT, Villain on RIGHT
-                        
-                        # If Player tries to run RIGHT into Villain
-                        if keys[pygame.K_RIGHT]:
-                            player.rect.right = villain.rect.left # Hard Stop
-                        
-                        # If Villain (AI) tries to run LEFT into Player
-                        elif action == "LEFT":
-                            villain.rect.left = player.rect.right # Hard Stop
-                            
-                        # If they spawned inside each other (glitch prevention)
-                        else:
-                            mid = (player.rect.centerx + villain.rect.centerx) / 2
-                            player.rect.right = mid
-                            villain.rect.left = mid
-
-                    else:
-                        # CASE B: Player is on the RIGHT, Villain on LEFT
-                        
-                        # If Player tries to run LEFT into Villain (Your specific request)
-                        if keys[pygame.K_LEFT]:
-                            player.rect.left = villain.rect.right # Hard Stop ("Run ends here")
-                            
-                        # If Villain (AI) tries to run RIGHT into Player
-                        elif action == "RIGHT":
-                            villain.rect.right = player.rect.left # Hard Stop
-                            
-                        # Glitch prevention
-                        else:
-                            mid = (player.rect.centerx + villain.rect.centerx) / 2
-                            player.rect.left = mid
-                            villain.rect.right = mid
-
-            # --- COMBAT ---
-            
-            # Player Hit Check
-            if p_hitbox and p_hitbox.colliderect(villain.rect) and not player.has_hit:
-                player.has_hit = True
-                dmg = 8 if player.attack_type == "punch" else 5
-                villain.take_damage(dmg)
-
-            # Villain Hit Check
-            if v_hitbox and v_hitbox.colliderect(player.rect) and not villain.has_hit:
-                villain.has_hit = True
-                dmg = 8 if villain.attack_type == "punch" else 5
-                player.take_damage(dmg)
-
-            # Projectiles
-            if player.projectile and player.projectile.rect.colliderect(villain.rect):
-                player.projectile.active = False
-                villain.take_damage(SHOOT_DAMAGE)
-
-            if villain.projectile and villain.projectile.rect.colliderect(player.rect):
-                villain.projectile.active = False
-                player.take_damage(SHOOT_DAMAGE)
-
-            # Game Over
-            if player.health <= 0:
-                winner = "VILLAIN WINS"
-                game_over = True
-            elif villain.health <= 0:
-                winner = "PLAYER WINS"
-                game_over = True
+        player, villain = match.p1, match.p2
+        while accumulator >= SIM_DT and not match.game_over:
+            accumulator -= SIM_DT
+            # --- INPUT + AI BRAIN + PHYSICS / COLLISION / COMBAT ---
+            # The brain is asked inside step(), once P1's keys have been applied
+            keys = read_player_input(pygame.key.get_pressed())
+            match.step(keys, brain.decide_action)
+            if recorder:
+                recorder.record(keys, match.frame_actions[1])
+                if match.game_over:
+                    save_recording()
+
+            # --- LEARNING ---
+            if hasattr(brain, "on_damage"):
+                if match.frame_damage[0]: brain.on_damage(True, match.frame_damage[0], player, villain)
+                if match.frame_damage[1]: brain.on_damage(False, match.frame_damage[1], player, villain)
+            if profiler: profiler.mark("brain")
+        if match.game_over:
+            accumulator = 0.0  # nothing is simulated on the game-over screen: don't bank time for it
 
         # --- DRAWING ---
-        # Background Floor
-        screen.blit(bg, (0, 0))
-
-        
-        player.draw(screen)
-        villain.draw(screen)
-        
-        # HUD
-        draw_text(f"P1: {int(player.health)}", 20, WHITE, 100, 30)
-        draw_text(f"CPU: {int(villain.health)}", 20, WHITE, WIDTH-100, 30)
-        
-        if game_over:
-            overlay = pygame.Surface((WIDTH, HEIGHT))
-            overlay.set_alpha(150)
-            overlay.fill(BLACK)
-            screen.blit(overlay, (0,0))
-            draw_text(winner, 60, GREEN if winner == "PLAYER WINS" else RED, WIDTH//2, HEIGHT//2)
-            draw_text("Press R to Restart", 30, WHITE, WIDTH//2, HEIGHT//2 + 50)
-
-        pygame.display.flip()
+        alpha = 1.0 if match.game_over else accumulator / SIM_DT
+        drawn = draw_match(screen, bg, match, profiler, alpha, erase=last_drawn)
+        if profiler: drawn.append(profiler.draw(screen))
 
+        if last_drawn is None:
+            pygame.display.flip()
+        else:
+            # Last frame's rects (now erased) plus this frame's
+            pygame.display.update(last_drawn + drawn)
+        # The game-over overlay covers the screen: back to full repaints until it goes
+        last_drawn = drawn if dirty_rects and not match.game_over else None
+        if profiler:
+            profiler.mark("flip")
+            profiler.end_frame()
+        if tracker: tracker.end_frame()
+
+    save_recording()  # match in progress at quit
+    if store:
+        store.close()
+    if profiler:
+        profiler.close()
+    if tracker:
+        tracker.close()
+    if telemetry:
+        telemetry.close()
     pygame.quit()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    import argparse
+    parser = argparse.ArgumentParser(description="Street Fighter style engine.")
+    parser.add_argument("--seed", type=int, default=None, help="deterministic AI")
+    parser.add_argument("--record", metavar="DIR", default=None, help="save each match's inputs to DIR")
+    parser.add_argument("--replay", metavar="FILE", default=None, help="re-simulate a recording and exit")
+    parser.add_argument("--render", action="store_true", help="with --replay: watch it instead of running headless")
+    parser.add_argument("--multi-shot", action="store_true", help="unlimited projectiles game mode")
+    parser.add_argument("--render-fps", type=int, default=RENDER_FPS, help="draw-rate cap, 0 = uncapped")
+    parser.add_argument("--trace-alloc", type=int, nargs="?", const=120, default=0, metavar="FRAMES",
+                        help="report allocations by call site every FRAMES frames (default 120)")
+    parser.add_argument("--telemetry", metavar="FILE", default=None,
+                        help="append match events to this log (read it back with load_telemetry)")
+    parser.add_argument("--dirty-rects", action="store_true",
+                        help="repaint only changed screen areas (faster on software rendering)")
+    parser.add_argument("--profile", nargs="?", const="", metavar="CSV", default=None,
+                        help="show per-phase frame timings; optionally dump every frame to CSV")
+    args = parser.parse_args()
+
+    if args.replay:
+        result = replay_match(args.replay, render=args.render)
+        print(f"{result.frame} frames, {result.winner or 'NO RESULT'}, "
+              f"P1 {int(result.p1.health)} / CPU {int(result.p2.health)}")
+    else:
+        main(seed=args.seed, record_dir=args.record,
+             profile=args.profile is not None, profile_csv=args.profile or None,
+             multi_shot=args.multi_shot, render_fps=args.render_fps, dirty_rects=args.dirty_rects,
+             trace_alloc=args.trace_alloc, telemetry_path=args.telemetry)
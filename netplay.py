@@ -0,0 +1,281 @@
+import argparse
+import heapq
+import os
+import random
+import socket
+import struct
+import time
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+import fighting_game as fg
+from fighting_game import FPS, Match, encode_input, read_player_input
+
+# --- ROLLBACK NETPLAY (two humans, no input delay) ---
+# Each side simulates every frame immediately with its own input and a
+# prediction for the remote one (the remote's last known input). When the real
+# remote input arrives and differs from what was predicted, the match is
+# restored from the snapshot taken before that frame and re-stepped up to the
+# present. Inputs travel as recording bytes (encode_input), so a brain-driven
+# side works too: its choice is sent once and never re-decided.
+
+MAX_ROLLBACK = 8  # frames simulated ahead of the remote before waiting for it
+MAX_PACKET_INPUTS = 64
+
+# Packet header (ack, first, count), then count input bytes. Every packet resends
+# all inputs the peer has not acknowledged yet, so lost datagrams need no retry.
+#   ack   = last remote frame we have received
+#   first = frame of the first input byte that follows
+PACKET = struct.Struct("<iiB")
+
+
+class Peer:
+    """
+    Non-blocking UDP endpoint. latency/jitter (ms) and loss (0..1) are applied
+    to outgoing datagrams, to test rollback over a loopback connection.
+    """
+    def __init__(self, port=0, host="127.0.0.1", latency=0, jitter=0, loss=0.0, seed=None):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind((host, port))
+        self.sock.setblocking(False)
+        self.remote = None
+        self.latency = latency / 1000.0
+        self.jitter = jitter / 1000.0
+        self.loss = loss
+        self.rng = random.Random(seed)
+        self.outbox = []  # heap of (due time, seq, datagram)
+        self.seq = 0
+
+    @property
+    def address(self):
+        return self.sock.getsockname()
+
+    def connect(self, address):
+        self.remote = address
+        return self
+
+    def send(self, data):
+        if self.rng.random() < self.loss:
+            return
+        delay = max(0.0, self.latency + self.rng.uniform(-self.jitter, self.jitter))
+        heapq.heappush(self.outbox, (time.perf_counter() + delay, self.seq, data))
+        self.seq += 1
+        self._flush()
+
+    def _flush(self):
+        now = time.perf_counter()
+        while self.outbox and self.outbox[0][0] <= now:
+            _, _, data = heapq.heappop(self.outbox)
+            try:
+                self.sock.sendto(data, self.remote)
+            except OSError:
+                pass  # peer not up yet: UDP, the next packet resends everything
+
+    def receive(self):
+        """Datagrams that have arrived since the last call."""
+        self._flush()
+        packets = []
+        while True:
+            try:
+                data, _ = self.sock.recvfrom(1024)
+            except (BlockingIOError, ConnectionResetError):
+                return packets
+            packets.append(data)
+
+    def close(self):
+        self.sock.close()
+
+
+class RollbackSession:
+    def __init__(self, match, local_side, peer, max_rollback=MAX_ROLLBACK):
+        self.match = match
+        self.local = local_side  # 0 = P1, 1 = P2
+        self.peer = peer
+        self.max_rollback = max_rollback
+        self.frame = 0              # frames advanced (keeps counting after a KO)
+        self.local_inputs = []      # one byte per frame
+        self.remote_inputs = []     # confirmed remote bytes, frames 0..len-1
+        self.used_remote = []       # remote byte each simulated frame actually used
+        self.acked = -1             # last local frame the peer has confirmed
+        # Match state before frame f lives at snapshots[f % len]
+        self.snapshots = [None] * (max_rollback + 2)
+        # Stats
+        self.rollbacks = 0
+        self.resim_frames = 0
+        self.resim_ms = []  # duration of each rollback
+        self.stalls = 0
+
+    @property
+    def confirmed(self):
+        """Last frame whose inputs from both sides are known."""
+        return min(len(self.remote_inputs), self.frame) - 1
+
+    @property
+    def finished(self):
+        # A KO only counts once every frame leading to it is confirmed
+        return self.match.game_over and self.confirmed >= self.match.frame - 1
+
+    def predict(self):
+        return self.remote_inputs[-1] if self.remote_inputs else 0
+
+    def _step(self, f, remote):
+        self.snapshots[f % len(self.snapshots)] = self.match.snapshot()
+        if f < len(self.used_remote): self.used_remote[f] = remote
+        else: self.used_remote.append(remote)
+        local = self.local_inputs[f]
+        if self.local == 0:
+            self.match.step(fg.decode_input(local), fg.decode_input(remote))
+        else:
+            self.match.step(fg.decode_input(remote), fg.decode_input(local))
+
+    def _rollback(self, start):
+        t = time.perf_counter()
+        self.match.restore(self.snapshots[start % len(self.snapshots)])
+        guess = self.predict()
+        for f in range(start, self.frame):
+            self._step(f, self.remote_inputs[f] if f < len(self.remote_inputs) else guess)
+        self.rollbacks += 1
+        self.resim_frames += self.frame - start
+        self.resim_ms.append(1000.0 * (time.perf_counter() - t))
+
+    def poll(self):
+        """Take in remote inputs (rolling back on a misprediction) and resend ours."""
+        mismatch = None
+        for data in self.peer.receive():
+            ack, first, count = PACKET.unpack_from(data)
+            self.acked = max(self.acked, ack)
+            inputs = data[PACKET.size:PACKET.size + count]
+            known = len(self.remote_inputs)
+            if first > known:
+                continue  # gap: wait for a packet that covers it
+            for f in range(known, first + count):
+                b = inputs[f - first]
+                self.remote_inputs.append(b)
+                if mismatch is None and f < self.frame and self.used_remote[f] != b:
+                    mismatch = f
+        if mismatch is not None:
+            self._rollback(mismatch)
+        self._send()
+
+    def _send(self):
+        first = self.acked + 1
+        pending = bytes(self.local_inputs[first:first + MAX_PACKET_INPUTS])
+        self.peer.send(PACKET.pack(len(self.remote_inputs) - 1, first, len(pending)) + pending)
+
+    def advance(self, local_input):
+        """
+        Run one frame with this side's input (an encode_input byte).
+        Returns False, without advancing, while too far ahead of the remote.
+        """
+        self.poll()
+        if self.frame - len(self.remote_inputs) >= self.max_rollback:
+            self.stalls += 1
+            return False
+        self.local_inputs.append(local_input)
+        f = self.frame
+        self.frame += 1
+        self._step(f, self.remote_inputs[f] if f < len(self.remote_inputs) else self.predict())
+        self._send()
+        return True
+
+    def stats(self):
+        worst = max(self.resim_ms, default=0.0)
+        return (f"{self.frame} frames, {self.rollbacks} rollbacks, "
+                f"{self.resim_frames / max(self.rollbacks, 1):.1f} frames/rollback, "
+                f"worst resim {worst:.2f} ms, {self.stalls} stalls")
+
+
+# --- LOOPBACK TEST (both peers in one process, random held inputs) ---
+def _random_inputs(rng, frames):
+    inputs = []
+    while len(inputs) < frames:
+        mask = rng.getrandbits(7)
+        inputs += [mask] * rng.randint(1, 20)  # keys are held for a while, like a human
+    return inputs[:frames]
+
+def run_loopback(frames=FPS * 20, latency=60, jitter=15, loss=0.05, seed=0, multi_shot=False):
+    rng = random.Random(seed)
+    peers = [Peer(latency=latency, jitter=jitter, loss=loss, seed=seed + i) for i in range(2)]
+    peers[0].connect(peers[1].address)
+    peers[1].connect(peers[0].address)
+    sessions = [RollbackSession(Match(multi_shot=multi_shot), side, peers[side]) for side in (0, 1)]
+    scripts = [_random_inputs(rng, frames) for _ in sessions]
+    reference = Match(multi_shot=multi_shot)  # same inputs, no network
+    for a, b in zip(*scripts):
+        reference.step(a, b)
+
+    # Both peers tick at FPS in real time, each only ever seeing the network
+    next_tick = time.perf_counter()
+    while any(s.confirmed < frames - 1 for s in sessions):
+        for s, script in zip(sessions, scripts):
+            if s.frame < frames: s.advance(encode_input(script[s.frame]))
+            else: s.poll()
+        next_tick += 1.0 / FPS
+        time.sleep(max(0.0, next_tick - time.perf_counter()))
+
+    for p in peers:
+        p.close()
+    return sessions, reference
+
+def _play(args):
+    fg.init_display()
+    peer = Peer(args.port, args.host, args.latency or 0, args.jitter or 0, args.loss or 0.0)
+    host, port = args.remote.rsplit(":", 1)
+    peer.connect((host, int(port)))
+    session = RollbackSession(Match(headless=False, multi_shot=args.multi_shot), args.player - 1, peer)
+    bg = fg.load_background()
+    accumulator = 0.0
+    running = True
+    while running:
+        accumulator = min(accumulator + fg.clock.tick(fg.RENDER_FPS) / 1000.0, fg.MAX_FRAME_TIME)
+        for event in fg.pygame.event.get():
+            if event.type == fg.pygame.QUIT:
+                running = False
+        while accumulator >= fg.SIM_DT and not session.finished:
+            if not session.advance(encode_input(read_player_input(fg.pygame.key.get_pressed()))):
+                break  # waiting on the remote: try again next frame
+            accumulator -= fg.SIM_DT
+        if session.finished:
+            session.poll()  # keep the peer's last frames acknowledged
+            accumulator = 0.0
+        fg.draw_match(fg.screen, bg, session.match, alpha=min(accumulator / fg.SIM_DT, 1.0))
+        fg.pygame.display.flip()
+    print(session.stats())
+    peer.close()
+    fg.pygame.quit()
+
+def main():
+    parser = argparse.ArgumentParser(description="Two-player rollback netplay over UDP.")
+    parser.add_argument("--loopback", action="store_true",
+                        help="headless self-test: two peers in this process with random inputs")
+    parser.add_argument("--frames", type=int, default=FPS * 20, help="with --loopback")
+    parser.add_argument("--player", type=int, choices=[1, 2], default=1)
+    parser.add_argument("--host", default="0.0.0.0", help="address to listen on")
+    parser.add_argument("--port", type=int, default=7001)
+    parser.add_argument("--remote", default="127.0.0.1:7002", help="HOST:PORT of the other player")
+    # Unset: none for live play, run_loopback()'s lossy link (60 ms, 15 ms, 5%) for --loopback
+    parser.add_argument("--latency", type=float, default=None, help="added one-way delay, ms")
+    parser.add_argument("--jitter", type=float, default=None, help="+/- random delay, ms")
+    parser.add_argument("--loss", type=float, default=None, help="fraction of packets dropped")
+    parser.add_argument("--multi-shot", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if not args.loopback:
+        _play(args)
+        return 0
+
+    link = {k: getattr(args, k) for k in ("latency", "jitter", "loss") if getattr(args, k) is not None}
+    sessions, reference = run_loopback(args.frames, seed=args.seed, multi_shot=args.multi_shot, **link)
+    # Replays the confirmed inputs without rollback: every peer must end up identical
+    ok = True
+    for s in sessions:
+        same = repr(s.match.snapshot()) == repr(reference.snapshot())
+        ok &= same
+        print(f"P{s.local + 1}: {s.stats()}  {'in sync' if same else 'DESYNC'}")
+    budget = 1000.0 / FPS
+    worst = max(max(s.resim_ms, default=0.0) for s in sessions)
+    print(f"worst rollback {worst:.2f} ms of a {budget:.1f} ms frame")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,101 @@
+import argparse
+import os
+import shutil
+import time
+from multiprocessing import Pool, cpu_count
+
+# Frames are drawn offscreen: no real window needed
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+# SDL would turn SIGTERM into a QUIT event, and Pool shuts its workers down with SIGTERM
+os.environ.setdefault("SDL_NO_SIGNAL_HANDLERS", "1")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+import fighting_game as fg
+from fighting_game import WIDTH, HEIGHT, FPS, Match, load_recording
+
+# --- OFFSCREEN REPLAY RENDERER (recording -> frame sequence, process pool) ---
+# The recording is split into contiguous chunks of frames, one pool task each.
+# Match.step() is deterministic, so a worker fast-forwards a rendered Match to
+# its chunk's first frame without drawing (animators included), then draws every
+# frame of the chunk with draw_match() onto an offscreen Surface.
+#   png: frame_000000.png, ... numbered by match frame, so chunks need no joining
+#   raw: frames.rgb, WIDTH x HEIGHT rgb24 per frame; each chunk writes a part
+#        file and the parts are concatenated in order at the end
+
+_rec = None  # the Recording, set in each worker by _init_worker
+_bg = None
+_surface = None
+
+def _init_worker(rec):
+    global _rec, _bg, _surface
+    _rec = rec
+    fg.init_display()  # dummy video driver: only so convert() has a pixel format
+    _bg = fg.load_background()
+    _surface = fg.pygame.Surface((WIDTH, HEIGHT))
+
+def _render_chunk(task):
+    start, end, out_dir, fmt = task
+    match = Match(headless=False, multi_shot=_rec.multi_shot)
+    inputs = _rec.inputs
+    for p1_action, p2_action in inputs[:start]:
+        match.step(p1_action, p2_action)
+    part = os.path.join(out_dir, f"part_{start:06d}.rgb")
+    raw = open(part, "wb") if fmt == "raw" else None
+    try:
+        for f in range(start, end):
+            match.step(*inputs[f])
+            fg.draw_match(_surface, _bg, match)
+            if raw: raw.write(fg.pygame.image.tobytes(_surface, "RGB"))
+            else: fg.pygame.image.save(_surface, os.path.join(out_dir, f"frame_{f:06d}.png"))
+    finally:
+        if raw: raw.close()
+    return start, end, part if raw else None
+
+def chunk_ranges(frames, chunks):
+    """[(start, end), ...] covering 0..frames in `chunks` near-equal pieces."""
+    chunks = max(1, min(chunks, frames))
+    bounds = [frames * k // chunks for k in range(chunks + 1)]
+    return [(a, b) for a, b in zip(bounds, bounds[1:]) if b > a]
+
+def render_replay(path, out_dir, fmt="png", workers=None, chunks=None, first=0, last=None):
+    """Render frames first..last-1 of a recording. Returns the number of frames written."""
+    rec = load_recording(path)
+    last = len(rec.inputs) if last is None else min(last, len(rec.inputs))
+    workers = workers or cpu_count()
+    # A few chunks per worker: later chunks fast-forward further, so they even out
+    ranges = chunk_ranges(last - first, chunks or workers * 4)
+    os.makedirs(out_dir, exist_ok=True)
+    tasks = [(first + a, first + b, out_dir, fmt) for a, b in ranges]
+    with Pool(workers, initializer=_init_worker, initargs=(rec,)) as pool:
+        parts = sorted(pool.imap_unordered(_render_chunk, tasks))
+
+    if fmt == "raw":
+        with open(os.path.join(out_dir, "frames.rgb"), "wb") as out:
+            for _, _, part in parts:
+                with open(part, "rb") as f:
+                    shutil.copyfileobj(f, out)
+                os.remove(part)
+    return max(last - first, 0)
+
+def main():
+    parser = argparse.ArgumentParser(description="Render a match recording to image frames without a window.")
+    parser.add_argument("recording")
+    parser.add_argument("--out", default="frames", help="output directory")
+    parser.add_argument("--format", choices=["png", "raw"], default="png",
+                        help="png files, or one raw rgb24 stream (frames.rgb)")
+    parser.add_argument("--first", type=int, default=0, help="first frame to render")
+    parser.add_argument("--last", type=int, default=None, help="stop before this frame")
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: all cores)")
+    parser.add_argument("--chunks", type=int, default=None, help="pool tasks (default: 4 per worker)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    frames = render_replay(args.recording, args.out, args.format, args.workers, args.chunks,
+                           args.first, args.last)
+    elapsed = time.perf_counter() - start
+    print(f"{frames} frames to {args.out} in {elapsed:.1f}s ({frames / max(elapsed, 1e-9):.0f} frames/s)")
+    if args.format == "raw":
+        print(f"ffmpeg -f rawvideo -pix_fmt rgb24 -s {WIDTH}x{HEIGHT} -r {FPS} "
+              f"-i {os.path.join(args.out, 'frames.rgb')} replay.mp4")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+import argparse
+import csv
+import itertools
+import math
+import os
+import random
+import time
+from multiprocessing import Pool, cpu_count
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+from fighting_game import FPS, Match, VillainBrain, LearningVillainBrain, LinearLearnWeight
+
+# --- HYPERPARAMETER SWEEP (LearningVillainBrain vs the rule brains, process pool) ---
+# Every config trains in rounds. One round is a set of headless matches against
+# each rule-based opponent, with damage fed to on_damage() just like main().
+# After each round the configs are ranked by damage margin per game and the
+# worst are dropped (successive halving). CPU goes to the promising ones.
+
+OPPONENTS = ("Easy", "Medium", "Hard")
+GRID = dict(lr=[0.05, 0.12, 0.3], gamma=[0.8, 0.9, 0.99], eps_start=[0.2, 0.35],
+            ramp=[2000.0, 4000.0, 8000.0], cap=[0.9])
+# Random search ranges: (low, high, log-scale?)
+RANGES = dict(lr=(0.01, 0.5, True), gamma=(0.7, 0.995, False), eps_start=(0.05, 0.5, False),
+              ramp=(500.0, 20000.0, True), cap=(0.5, 1.0, False))
+
+def grid_configs(grid=GRID):
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+
+def random_configs(n, seed=0, ranges=RANGES):
+    rng = random.Random(seed)
+    configs = []
+    for _ in range(n):
+        config = {}
+        for key, (lo, hi, log) in ranges.items():
+            config[key] = math.exp(rng.uniform(math.log(lo), math.log(hi))) if log else rng.uniform(lo, hi)
+        configs.append(config)
+    return configs
+
+def make_brain(config, seed):
+    return LearningVillainBrain("Hard", lr=config["lr"], gamma=config["gamma"],
+                                eps_start=config["eps_start"], seed=seed,
+                                learn_weight=LinearLearnWeight(ramp=config["ramp"], cap=config["cap"]))
+
+def train_match(brain, opponent, max_frames):
+    """One headless match, the learning brain as P2 (the villain side), learning as it goes."""
+    match = Match()
+    while not match.game_over and match.frame < max_frames:
+        match.step(opponent.decide_action(match.p1, match.p2), brain.decide_action(match.p2, match.p1))
+        if match.frame_damage[0]: brain.on_damage(True, match.frame_damage[0], match.p1, match.p2)
+        if match.frame_damage[1]: brain.on_damage(False, match.frame_damage[1], match.p1, match.p2)
+    return match
+
+def _train_round(task):
+    i, brain, games, max_frames, seed = task
+    random.seed(seed)  # the rule opponents draw from the global random module
+    wins = dealt = taken = 0
+    for g in range(games):
+        match = train_match(brain, VillainBrain(OPPONENTS[g % len(OPPONENTS)]), max_frames)
+        wins += match.winner == "VILLAIN WINS"
+        dealt += match.damage_dealt[1]
+        taken += match.damage_dealt[0]
+    return i, brain, wins, dealt, taken
+
+def run_sweep(configs, rounds=4, games=6, max_frames=FPS * 99, keep=0.5, workers=None, seed=0):
+    """Returns one result dict per config, best first. Dropped configs keep their last scores."""
+    results = [dict(config=c, rounds=0, games=0, wins=0, dealt=0, taken=0, score=float("-inf"))
+               for c in configs]
+    brains = {i: make_brain(c, seed + i) for i, c in enumerate(configs)}
+    with Pool(workers or cpu_count()) as pool:
+        for r in range(rounds):
+            tasks = [(i, brain, games, max_frames, seed + 1000 * (r + 1) + i) for i, brain in brains.items()]
+            for i, brain, wins, dealt, taken in pool.imap_unordered(_train_round, tasks):
+                brains[i] = brain  # trained copy back from the worker
+                res = results[i]
+                res["rounds"] += 1
+                res["games"] += games
+                res["wins"] += wins
+                res["dealt"] += dealt
+                res["taken"] += taken
+                res["score"] = (dealt - taken) / games  # this round only: the brain keeps improving
+            print(f"round {r + 1}/{rounds}: {len(brains)} configs", flush=True)
+            if r == rounds - 1:
+                break
+            # Early stopping: only the best `keep` fraction trains on
+            ranked = sorted(brains, key=lambda i: results[i]["score"], reverse=True)
+            brains = {i: brains[i] for i in ranked[:max(1, math.ceil(len(ranked) * keep))]}
+    return sorted(results, key=lambda res: (res["rounds"], res["score"]), reverse=True)
+
+def format_table(results):
+    lines = [f"{'#':>3}  {'LR':>7}{'GAMMA':>7}{'EPS':>6}{'RAMP':>8}{'CAP':>6}"
+             f"{'ROUNDS':>8}{'SCORE':>8}{'WIN%':>7}{'DMG+/G':>8}{'DMG-/G':>8}"]
+    for rank, res in enumerate(results, 1):
+        c, g = res["config"], max(res["games"], 1)
+        lines.append(
+            f"{rank:>3}  {c['lr']:>7.3f}{c['gamma']:>7.3f}{c['eps_start']:>6.2f}{c['ramp']:>8.0f}{c['cap']:>6.2f}"
+            f"{res['rounds']:>8}{res['score']:>8.1f}{100.0 * res['wins'] / g:>6.1f}%"
+            f"{res['dealt'] / g:>8.1f}{res['taken'] / g:>8.1f}"
+        )
+    return "\n".join(lines)
+
+def write_csv(path, results):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["lr", "gamma", "eps_start", "ramp", "cap", "rounds", "games", "wins",
+                         "dealt", "taken", "score"])
+        for res in results:
+            c = res["config"]
+            writer.writerow([c["lr"], c["gamma"], c["eps_start"], c["ramp"], c["cap"], res["rounds"],
+                             res["games"], res["wins"], res["dealt"], res["taken"], res["score"]])
+
+def main():
+    parser = argparse.ArgumentParser(description="Tune LearningVillainBrain against the rule-based brains.")
+    parser.add_argument("--search", choices=["grid", "random"], default="random")
+    parser.add_argument("--configs", type=int, default=24, help="with --search random")
+    parser.add_argument("--rounds", type=int, default=4, help="training rounds (pruning happens between them)")
+    parser.add_argument("--games", type=int, default=6, help="matches per config per round")
+    parser.add_argument("--keep", type=float, default=0.5, help="fraction of configs kept after each round")
+    parser.add_argument("--max-frames", type=int, default=FPS * 99)
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: all cores)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=None, help="also write the results table as CSV")
+    args = parser.parse_args()
+
+    configs = grid_configs() if args.search == "grid" else random_configs(args.configs, args.seed)
+    start = time.perf_counter()
+    results = run_sweep(configs, args.rounds, args.games, args.max_frames, args.keep, args.workers, args.seed)
+    elapsed = time.perf_counter() - start
+    print(format_table(results))
+    print(f"\n{len(configs)} configs, {sum(r['games'] for r in results)} matches in {elapsed:.1f}s")
+    if args.out:
+        write_csv(args.out, results)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+import os
+
+import numpy as np
+import pytest
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+import fighting_game as fg
+from batch_env import ACTIONS, ATTACK_NONE, ATTACK_PUNCH, ATTACK_KICK, BatchMatch
+
+ATTACK_TYPES = {None: ATTACK_NONE, "punch": ATTACK_PUNCH, "kick": ATTACK_KICK}
+
+def fighter_state(f):
+    """The BatchMatch fields of one Match fighter, as plain numbers."""
+    proj = f.projectile is not None and f.projectile.active
+    return dict(
+        x=f.rect.x, y=f.rect.y, vel_y=f.vel_y, direction=f.direction, health=f.health,
+        is_attacking=f.is_attacking, attack_type=ATTACK_TYPES[f.attack_type],
+        attack_frame=f.attack_frame, has_hit=f.has_hit, combo_count=f.combo_count,
+        last_attack_time=f.last_attack_time, is_shielding=f.is_shielding,
+        shield_gauge=f.shield_gauge, shield_cooldown=f.shield_cooldown, has_shot=f.has_shot,
+        shoot_anim_frame=f.shoot_anim_frame, proj_active=proj,
+        proj_x=f.projectile.rect.x if proj else None, proj_y=f.projectile.rect.y if proj else None,
+    )
+
+def batch_state(batch, s, i):
+    state = {k: getattr(batch, k)[s, i].item() for k in (
+        "x", "y", "vel_y", "direction", "health", "is_attacking", "attack_type", "attack_frame",
+        "has_hit", "combo_count", "last_attack_time", "is_shielding", "shield_gauge",
+        "shield_cooldown", "has_shot", "shoot_anim_frame", "proj_active")}
+    proj = state["proj_active"]
+    state["proj_x"] = batch.proj_x[s, i].item() if proj else None
+    state["proj_y"] = batch.proj_y[s, i].item() if proj else None
+    return state
+
+def assert_same(matches, batch, frame):
+    for i, match in enumerate(matches):
+        for s, f in enumerate((match.p1, match.p2)):
+            assert fighter_state(f) == batch_state(batch, s, i), f"match {i}, side {s}, frame {frame}"
+        assert match.game_over == batch.done[i], f"match {i}, frame {frame}"
+
+@pytest.mark.parametrize("wall", ["LEFT", "RIGHT"])
+def test_batch_match_matches_match(wall):
+    """Random play, both sides: every fighter field agrees with Match after every step."""
+    n, frames = 32, 1500
+    rng = np.random.default_rng(0)
+    # Leaning towards one wall pins fighters there, where collision pushes go off screen
+    p = np.full(len(ACTIONS), 1.0)
+    p[ACTIONS.index(wall)] = 6.0
+    p /= p.sum()
+    batch = BatchMatch(n, max_frames=frames + 1)
+    matches = [fg.Match() for _ in range(n)]
+    for frame in range(frames):
+        a = rng.choice(len(ACTIONS), (2, n), p=p)
+        if batch.done.any():
+            # BatchMatch resets finished matches at the start of its next step
+            matches = [fg.Match() if batch.done[i] else m for i, m in enumerate(matches)]
+        for i, match in enumerate(matches):
+            match.step(ACTIONS[a[0, i]], ACTIONS[a[1, i]])
+        batch.step(a[0], a[1])
+        assert_same(matches, batch, frame)
@@ -0,0 +1,122 @@
+import math
+import os
+import random
+
+import numpy as np
+import pytest
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+import fighting_game as fg
+from fighting_game import (
+    AWAY, TOWARDS, GAP_EDGES, CompiledVillainBrain, VillainBrain, compile_policy, policy_arrays,
+    policy_cells,
+)
+from batch_env import ACTIONS, BatchMatch, BatchVillainBrain
+from test_batch_env import assert_same
+
+DIFFICULTIES = ("Easy", "Medium", "Hard")
+GAPS_PER_CELL = 8
+SAMPLES_PER_GAP = 400
+
+def cell_gaps(bucket):
+    """A spread of gaps inside one GAP_EDGES bucket (the last one is open-ended)."""
+    lo = GAP_EDGES[bucket - 1] if bucket else 0
+    hi = GAP_EDGES[bucket] - 1 if bucket < len(GAP_EDGES) else lo + 400
+    return sorted({lo + (hi - lo) * k // (GAPS_PER_CELL - 1) for k in range(GAPS_PER_CELL)})
+
+def cell_flags(state):
+    flags = state % 32
+    return tuple(bool((flags >> b) & 1) for b in (4, 3, 2, 1, 0))
+
+@pytest.mark.parametrize("difficulty", DIFFICULTIES)
+def test_compiled_policy_matches_rules(difficulty):
+    """Every cell's compiled distribution against _decide sampled across the cell's gap range."""
+    rules = VillainBrain(difficulty, rng=random.Random(0))
+    table = compile_policy(difficulty)
+    assert len(table) == CompiledVillainBrain.N_STATES
+    for state, (cum, outcomes) in enumerate(table):
+        probs = dict(zip(outcomes, [b - a for a, b in zip((0.0,) + cum, cum + (1.0,))]))
+        assert math.isclose(sum(probs.values()), 1.0)
+        attacking, can_shield, cornered, has_shot, proj_threat = cell_flags(state)
+        counts = dict.fromkeys(outcomes, 0)
+        n = 0
+        for gap in cell_gaps(state // 32):
+            assert CompiledVillainBrain.state_index(gap, attacking, can_shield, cornered,
+                                                    has_shot, proj_threat) == state
+            for _ in range(SAMPLES_PER_GAP):
+                outcome = rules._decide(gap, AWAY, TOWARDS, attacking, can_shield, cornered,
+                                        has_shot, proj_threat)
+                assert outcome in counts, f"state {state}, gap {gap}: {outcome} not compiled"
+                counts[outcome] += 1
+                n += 1
+        for outcome, p in probs.items():
+            # 5 standard errors: a real mismatch is far outside, sampling noise never is
+            assert abs(counts[outcome] / n - p) <= 5 * math.sqrt(p * (1 - p) / n) + 1e-9, \
+                f"state {state}: {outcome} sampled {counts[outcome] / n:.4f}, compiled {p:.4f}"
+
+@pytest.mark.parametrize("difficulty", DIFFICULTIES)
+def test_cells_and_arrays_follow_table(difficulty):
+    table = compile_policy(difficulty)
+    cells = policy_cells(difficulty)
+    cum_arr, action_arr, hold_arr = policy_arrays(difficulty)
+    for state, (cum, outcomes) in enumerate(table):
+        gap = GAP_EDGES[state // 32 - 1] if state >= 32 else 0
+        attacking, can_shield, cornered, has_shot, proj_threat = cell_flags(state)
+        for left, away, towards in ((0, "RIGHT", "LEFT"), (1, "LEFT", "RIGHT")):
+            c, resolved = cells[gap][attacking][can_shield][cornered][has_shot][proj_threat][left]
+            expected = [(away if a == AWAY else towards if a == TOWARDS else a, h) for a, h in outcomes]
+            assert (c or ()) == cum
+            assert (list(resolved) if c else [resolved]) == expected
+        k = len(outcomes)
+        assert tuple(cum_arr[state, :k - 1]) == cum and np.isinf(cum_arr[state, k - 1:]).all()
+        for i, (a, h) in enumerate(outcomes):
+            code = fg.POLICY_AWAY if a == AWAY else fg.POLICY_TOWARDS if a == TOWARDS else ACTIONS.index(a)
+            assert action_arr[state, i] == code and hold_arr[state, i] == h
+
+# P1 leans RIGHT, into the villain: it gets pinned against the right wall, where
+# collision pushes go off screen (the case BatchMatch._move once clamped too eagerly)
+P1_ODDS = np.array([6.0 if a == "RIGHT" else 1.0 for a in ACTIONS]) / (len(ACTIONS) + 5)
+
+class _FixedDraw:
+    def __init__(self):
+        self.u = 0.0
+
+    def random(self):
+        return self.u
+
+@pytest.mark.parametrize("difficulty", DIFFICULTIES)
+def test_batch_brain_matches_compiled_brain(difficulty):
+    """Fed the same uniform draws, BatchVillainBrain and CompiledVillainBrain act identically
+    and every fighter field of both sides stays equal, frame by frame."""
+    n, frames = 16, 400
+
+    class RecordingRng:
+        def __init__(self):
+            self.g = np.random.default_rng(1)
+            self.last = None
+
+        def random(self, size):
+            self.last = self.g.random(size)
+            return self.last
+
+    batch = BatchMatch(n, max_frames=frames + 1)
+    batch_brain = BatchVillainBrain(difficulty, n)
+    batch_brain.rng = RecordingRng()
+    draws = [_FixedDraw() for _ in range(n)]
+    matches = [fg.Match() for _ in range(n)]
+    brains = [CompiledVillainBrain(difficulty, rng=d) for d in draws]
+    rng = np.random.default_rng(2)
+    for frame in range(frames):
+        p1 = rng.choice(len(ACTIONS), n, p=P1_ODDS)
+        for i in np.flatnonzero(batch.done):
+            # decide() starts the next match for finished ones
+            matches[i] = fg.Match()
+            brains[i] = CompiledVillainBrain(difficulty, rng=draws[i])
+        p2 = batch_brain.decide(batch, 1)
+        for i, (match, brain) in enumerate(zip(matches, brains)):
+            draws[i].u = batch_brain.rng.last[i]
+            action = brain.decide_action(match.p2, match.p1)
+            assert ACTIONS.index(action) == p2[i], f"match {i}, frame {frame}"
+            match.step(ACTIONS[p1[i]], action)
+        batch.step(p1, p2)
+        assert_same(matches, batch, frame)
@@ -0,0 +1,121 @@
+import argparse
+import copy
+import os
+import random
+import time
+from multiprocessing import Pool, cpu_count
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+from fighting_game import FPS, run_headless, VillainBrain, LearningVillainBrain, QTableStore
+
+# --- SELF-PLAY TOURNAMENT (round-robin over a process pool, Elo table) ---
+# Every pairing is played from both sides (P1/P2) so start position is not a factor.
+# One headless match per pool task; brains are sent to each worker once.
+# Learning brains play in evaluation mode (greedy, no replay or updates), so a
+# result depends only on the saved table and the task's seed.
+
+ELO_START = 1500
+ELO_K = 32
+
+_entrants = None  # (name, brain) list, set in each worker by _init_worker
+
+def _init_worker(entrants):
+    global _entrants
+    _entrants = entrants
+
+def _play(task):
+    i, j, seed, max_frames = task
+    random.seed(seed)  # brains draw from the global random module
+    # Workers hold one copy of each brain; every match starts from a fresh clone
+    b1 = copy.deepcopy(_entrants[i][1])
+    b2 = copy.deepcopy(_entrants[j][1])
+    match = run_headless(b1, b2, max_frames)
+    if match.winner == "PLAYER WINS": score = 1.0
+    elif match.winner == "VILLAIN WINS": score = 0.0
+    else: score = 0.5
+    return i, j, seed, score, match.damage_dealt[0], match.damage_dealt[1], match.frame
+
+def default_entrants():
+    entrants = [(d, VillainBrain(d)) for d in ("Easy", "Medium", "Hard")]
+    entrants += [(f"Learning-{d}", LearningVillainBrain(d).evaluate()) for d in ("Easy", "Medium", "Hard")]
+    return entrants
+
+def learning_entrant(path, difficulty="Hard"):
+    """A LearningVillainBrain loaded from a .qtab file (QTableStore), in evaluation mode."""
+    brain = QTableStore.load(path, LearningVillainBrain(difficulty))
+    return os.path.splitext(os.path.basename(path))[0], brain.evaluate()
+
+def make_schedule(n, games_per_side, max_frames, seed=0):
+    tasks = []
+    for i in range(n):
+        for j in range(n):
+            if i == j: continue
+            for _ in range(games_per_side):
+                tasks.append((i, j, seed + len(tasks), max_frames))
+    return tasks
+
+def elo_ratings(n, results):
+    """Sequential Elo over results, in schedule order so the table is reproducible."""
+    ratings = [float(ELO_START)] * n
+    for i, j, _, score, *_ in sorted(results, key=lambda r: r[2]):
+        expected = 1.0 / (1.0 + 10 ** ((ratings[j] - ratings[i]) / 400.0))
+        delta = ELO_K * (score - expected)
+        ratings[i] += delta
+        ratings[j] -= delta
+    return ratings
+
+def run_tournament(entrants, games_per_side=10, max_frames=FPS * 99, workers=None, seed=0):
+    tasks = make_schedule(len(entrants), games_per_side, max_frames, seed)
+    workers = workers or cpu_count()
+    # Several tasks per IPC round trip, but small enough to keep every core busy
+    chunksize = max(1, len(tasks) // (workers * 8))
+    with Pool(workers, initializer=_init_worker, initargs=(entrants,)) as pool:
+        results = list(pool.imap_unordered(_play, tasks, chunksize=chunksize))
+
+    stats = [dict(name=name, games=0, wins=0, losses=0, draws=0, dealt=0, taken=0)
+             for name, _ in entrants]
+    for i, j, _, score, dmg_i, dmg_j, _ in results:
+        for me, dealt, taken, my_score in ((i, dmg_i, dmg_j, score), (j, dmg_j, dmg_i, 1.0 - score)):
+            st = stats[me]
+            st["games"] += 1
+            st["dealt"] += dealt
+            st["taken"] += taken
+            if my_score == 1.0: st["wins"] += 1
+            elif my_score == 0.0: st["losses"] += 1
+            else: st["draws"] += 1
+
+    for st, rating in zip(stats, elo_ratings(len(entrants), results)):
+        st["elo"] = rating
+    return sorted(stats, key=lambda st: st["elo"], reverse=True)
+
+def format_table(stats):
+    lines = [f"{'#':>2}  {'BRAIN':<18}{'ELO':>7}{'WIN%':>7}{'W':>6}{'L':>6}{'D':>6}{'DMG+/G':>9}{'DMG-/G':>9}"]
+    for rank, st in enumerate(stats, 1):
+        g = max(st["games"], 1)
+        lines.append(
+            f"{rank:>2}  {st['name']:<18}{st['elo']:>7.0f}{100.0 * st['wins'] / g:>6.1f}%"
+            f"{st['wins']:>6}{st['losses']:>6}{st['draws']:>6}"
+            f"{st['dealt'] / g:>9.1f}{st['taken'] / g:>9.1f}"
+        )
+    return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description="Round-robin self-play tournament between brains.")
+    parser.add_argument("--games", type=int, default=10, help="games per pairing per side")
+    parser.add_argument("--max-frames", type=int, default=FPS * 99, help="frame limit before a draw")
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: all cores)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--learning", action="append", default=[], metavar="FILE",
+                        help="add a learning brain saved as a .qtab file (repeatable)")
+    args = parser.parse_args()
+
+    entrants = default_entrants() + [learning_entrant(path) for path in args.learning]
+    start = time.perf_counter()
+    stats = run_tournament(entrants, args.games, args.max_frames, args.workers, args.seed)
+    elapsed = time.perf_counter() - start
+    print(format_table(stats))
+    games = sum(st["games"] for st in stats) // 2
+    print(f"\n{games} matches in {elapsed:.1f}s")
+
+if __name__ == "__main__":
+    main()